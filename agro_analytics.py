@@ -1,67 +1,396 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-from ta.trend import SMAIndicator, MACD
-from ta.momentum import RSIIndicator
-from ta.volatility import BollingerBands
-import streamlit as st
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+import csv
+import json
+import multiprocessing
+import os
+import threading
 import time
+from cache import TTLCache, LRUCache
+from price_store import PriceStore
+from dividend_store import DividendStore
+from fetcher import Fetcher
+from panel import build_panel, score_panel, score_shard, ttm_yield
+from indicators import IndicatorState
+from metrics import METRICS
+from providers import make_provider
+
+# Este módulo não depende do Streamlit: serve ao app, ao worker e à CLI.
+# yfinance (via providers) e ta são importados no primeiro uso.
 
 # --- CONFIGURAÇÃO ---
-BRAPI_TOKEN = st.secrets.get("BRAPI_TOKEN", "iExnKM1xcbQcYL3cNPhPQ3")
+# O app sobrescreve o token com o de st.secrets; fora dele vale a variável de ambiente
+BRAPI_TOKEN = os.environ.get("BRAPI_TOKEN", "iExnKM1xcbQcYL3cNPhPQ3")
+DATA_PROVIDER = os.environ.get("AGRO_PROVIDER", "yahoo")  # 'yahoo' ou 'brapi' (B3 pelo brapi)
+CACHE_TTL = 14400      # 4 horas
+MEMO_SIZE = 1024       # Entradas (ticker, última barra) de indicadores/scores em memória
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']  # Únicas colunas usadas depois do download
+ACTION_COLUMNS = ['Dividends', 'Stock Splits']  # Eventos que vêm junto das cotações
+PRICE_DTYPE = np.float32  # Em memória; o disco guarda o float64 original
+PARALLEL_MIN = 2000    # Abaixo disso, abrir processos custa mais que pontuar num só
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SNAPSHOT_PATH = os.path.join(DATA_DIR, 'snapshot.pkl')
+UNIVERSE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'universe.csv')
 
+# --- UNIVERSO DE ATIVOS ---
+# Lido de universe.csv (ticker,name,category) ou de um JSON com a mesma lista
+# de registros. Índices montados uma vez na carga: ticker -> (nome, categoria),
+# ticker de tela (sem .SA) -> ticker completo, e prefixos/substrings -> tickers
+# para a busca.
 class AgroDatabase:
-    def __init__(self):
-        self.assets = {
-            'Fiagros (Renda Mensal)': {
-                'SNAG11.SA': 'Suno Agro', 'KNCA11.SA': 'Kinea Agro', 'VGIA11.SA': 'Valora CRA',
-                'BBGO11.SA': 'BB Crédito', 'FGAA11.SA': 'FG Agro', 'RZAG11.SA': 'Riza Agro',
-                'XPCA11.SA': 'XP Crédito', 'AGRX11.SA': 'Exes Araguaia', 'CPTR11.SA': 'Capitania',
-                'RURA11.SA': 'Itaú Rural', 'OIAG11.SA': 'Ourinvest'
-            },
-            'Ações (Crescimento)': {
-                'SLCE3.SA': 'SLC Agrícola', 'AGRO3.SA': 'BrasilAgro', 'SMTO3.SA': 'São Martinho',
-                'RAIZ4.SA': 'Raízen', 'SOJA3.SA': 'Boa Safra', 'TTEN3.SA': '3Tentos',
-                'AGXY3.SA': 'AgroGalaxy', 'BEEF3.SA': 'Minerva', 'MRFG3.SA': 'Marfrig',
-                'JBSS3.SA': 'JBS', 'BRFS3.SA': 'BRF', 'CAML3.SA': 'Camil', 'MDIA3.SA': 'M. Dias Branco',
-                'SUZB3.SA': 'Suzano', 'KLBN11.SA': 'Klabin', 'KEPL3.SA': 'Kepler Weber'
-            },
-            'Global (BDRs/ETFs)': {
-                'DE': 'Deere & Co', 'AGCO': 'AGCO Corp', 'ADM': 'Archer Daniels',
-                'BG': 'Bunge', 'MOS': 'Mosaic', 'NTR': 'Nutrien', 'CTVA': 'Corteva',
-                'CF': 'CF Industries', 'BVEG39.SA': 'iShares Global', 'RZTR11.SA': 'Investo Teckma'
-            },
-            'Commodities': {
-                'ZC=F': 'Milho (Chicago)', 'ZS=F': 'Soja (Chicago)', 'KC=F': 'Café (NY)',
-                'LE=F': 'Boi Gordo', 'SB=F': 'Açúcar'
-            }
-        }
+    def __init__(self, path=UNIVERSE_PATH):
+        self.assets = {}  # {categoria: {ticker: nome}}, na ordem do arquivo
+        for row in self._read(path):
+            self.assets.setdefault(row['category'], {})[row['ticker']] = row['name']
+        self._info = {t: (name, cat) for cat, items in self.assets.items() for t, name in items.items()}
+        self._display = {self.display(t): t for t in self._info}
+        self._substrings, self._prefixes = {}, {}
+        for ticker in self._info:
+            key = ticker.upper()
+            for i in range(len(key)):
+                for j in range(i + 1, len(key) + 1):
+                    self._substrings.setdefault(key[i:j], set()).add(ticker)
+                self._prefixes.setdefault(key[:i + 1], set()).add(ticker)
+
+    @staticmethod
+    def _read(path):
+        with open(path, encoding='utf-8', newline='') as f:
+            if path.endswith('.json'): return json.load(f)
+            return list(csv.DictReader(f))
+
+    @staticmethod
+    def display(ticker):
+        return ticker.replace('.SA', '')
 
     def get_info(self, ticker):
-        for cat, items in self.assets.items():
-            if ticker in items: return items[ticker], cat
-        return ticker, "Outros"
+        return self._info.get(ticker, (ticker, "Outros"))
+
+    def resolve(self, display_ticker):
+        # Ticker de tela (SLCE3) -> ticker completo (SLCE3.SA)
+        return self._display.get(display_ticker)
+
+    def search(self, query, prefix=False):
+        # Tickers que contêm (ou começam com) 'query': uma consulta ao índice
+        index = self._prefixes if prefix else self._substrings
+        return index.get(query.upper(), frozenset())
+
+    def get_tickers(self, category=None):
+        if category: return list(self.assets.get(category, {}))
+        return list(self._info)
 
 class TechnicalEngine:
-    # CACHE DE 4 HORAS: Evita chamar o Yahoo toda hora e ser bloqueado
-    @st.cache_data(ttl=14400, show_spinner=False)
-    def get_data(_self, ticker):
-        time.sleep(0.3) # Pausa respeitosa entre requisições
-        for _ in range(2):
-            try:
-                df = yf.download(ticker, period='2y', progress=False, auto_adjust=True)
-                if not df.empty and len(df) > 50:
-                    if isinstance(df.columns, pd.MultiIndex):
-                        df.columns = df.columns.get_level_values(0)
-                    return df
-                time.sleep(1)
-            except: 
-                time.sleep(1)
-        return None
+    # CACHE DE 4 HORAS: Evita chamar o Yahoo toda hora e ser bloqueado.
+    # Abaixo do cache fica o histórico em disco: vencido o TTL, só as barras
+    # posteriores à última data gravada são baixadas.
+    def __init__(self, store=None, fetcher=None, cache_factory=TTLCache, processes=1, provider=None,
+                 dividend_store=None):
+        # cache_factory(ttl): backend dos caches com TTL (interface do TTLCache)
+        # processes > 1: score de universos grandes fatiado entre processos
+        # provider: fonte das cotações (providers.py); padrão conforme DATA_PROVIDER
+        # dividend_store: recebe os proventos que chegam junto das cotações
+        self.fetcher = fetcher or Fetcher()
+        self.provider = provider or make_provider(DATA_PROVIDER, BRAPI_TOKEN)
+        self.cache = cache_factory(CACHE_TTL)
+        self.misses = cache_factory(CACHE_TTL)  # Tickers sem dados: não insiste até o TTL vencer
+        self.store = store or PriceStore(os.path.join(DATA_DIR, 'ohlcv'))
+        self.dividend_store = dividend_store or DividendStore(os.path.join(DATA_DIR, 'dividends'))
+        self.states = {}  # Estado incremental dos indicadores por ticker
+        self.memo = LRUCache(MEMO_SIZE)  # (ticker, última barra) -> score e indicadores
+        self.processes = processes
+        self._pool = None
+        self._refreshing = set()  # Tickers com revalidação em andamento
+        self._live_at = {}  # ticker -> momento da última cotação ao vivo
+        self._lock = threading.Lock()
+
+    @METRICS.timed('get_data')
+    def get_data(self, ticker):
+        # Stale-while-revalidate: vencido o TTL, devolve o que está no cache na
+        # hora e atualiza em segundo plano. Só quem nunca baixou o ticker espera.
+        df = self.cache.get(ticker, allow_stale=True)
+        if df is not None or ticker in self.misses:
+            METRICS.incr('cache_hits_total', cache='prices')
+            if self.cache.is_stale(ticker): self.revalidate([ticker])
+            return df
+        METRICS.incr('cache_misses_total', cache='prices')
+        # Sessões concorrentes pedindo o mesmo ticker dividem um único download
+        return self.fetcher.flight.do(('prices', ticker), self._load, ticker)
+
+    def _load(self, ticker):
+        # Outro chamador pode ter publicado o ticker enquanto este esperava a vez
+        df = self.cache.get(ticker)
+        return df if df is not None else self._fetch_single(ticker)
+
+    @METRICS.timed('prefetch')
+    def prefetch(self, tickers):
+        needed = lambda t: self.cache.get(t, allow_stale=True) is None and t not in self.misses
+        stale = [t for t in tickers if self.cache.is_stale(t)]
+        if stale: self.revalidate(stale)
+        self._download_many([t for t in tickers if needed(t)], needed)
+        return {t: self.cache.get(t, allow_stale=True) for t in tickers}
+
+    def refresh(self, tickers):
+        # Atualização manual: baixa de novo só os tickers pedidos, ignorando o
+        # TTL, e esquece os 'sem dados' deles. O resto do cache fica intacto.
+        for ticker in tickers: self.misses.invalidate(ticker)
+        self._download_many(list(tickers))
+
+    def invalidate(self, tickers):
+        # Derruba as entradas em memória: a próxima leitura vai ao disco/rede
+        for ticker in tickers:
+            self.cache.invalidate(ticker)
+            self.misses.invalidate(ticker)
+
+    def revalidate(self, tickers):
+        # Agenda a atualização em segundo plano, uma por ticker de cada vez
+        with self._lock:
+            todo = [t for t in tickers if t not in self._refreshing]
+            self._refreshing.update(todo)
+        if todo: self.fetcher.background(self._revalidate, todo)
+
+    def _revalidate(self, tickers):
+        try:
+            METRICS.incr('revalidations_total', len(tickers), cache='prices')
+            self._download_many(tickers, self.cache.is_stale)
+        finally:
+            with self._lock: self._refreshing.difference_update(tickers)
+
+    def _download_many(self, tickers, needed=None):
+        # Tickers já em download por outra sessão não são baixados de novo: espera-se
+        # por eles. Dos assumidos, 'needed' descarta os que ficaram prontos nesse meio-tempo.
+        if not tickers: return
+        owned, waiting = self.fetcher.flight.claim([('prices', t) for t in tickers])
+        try:
+            todo = [key[1] for key in owned]
+            self._download_batches([t for t in todo if needed(t)] if needed else todo)
+        finally:
+            self.fetcher.flight.release(owned)
+        self.fetcher.flight.wait(waiting)
+
+    def _download_batches(self, tickers):
+        # Download em lote: uma requisição multi-ticker a cada 'batch_size' ativos
+        # do provedor, agrupando os ativos pelo provedor que os atende e pela data
+        # de onde o download incremental começa. Os lotes rodam em paralelo no pool.
+        if not tickers: return
+        version = {t: self.cache.stored_at(t) for t in tickers}
+        groups = {}
+        for ticker in tickers:
+            key = (self.provider.route(ticker), self.store.last_date(ticker))
+            groups.setdefault(key, []).append(ticker)
+        jobs = [(provider, start, group[i:i + provider.batch_size])
+                for (provider, start), group in groups.items()
+                for i in range(0, len(group), provider.batch_size)]
+        self.fetcher.map(self._fetch_batch, jobs)
+
+        # Quem ficou de fora do lote tenta sozinho, também em paralelo
+        leftovers = [t for t in tickers if self.cache.stored_at(t) == version[t]]
+        self.fetcher.map(self._fetch_single, leftovers)
+
+    def _fetch_single(self, ticker):
+        start = self.store.last_date(ticker)
+        new = self.fetcher.call(('prices', ticker), self._fetch_one, ticker, start)
+        # Sem rede, _commit serve o que já está gravado
+        df = self._commit(ticker, new)
+        if df is None: self.misses.set(ticker, True)
+        return df
+
+    def _fetch_one(self, ticker, start):
+        df = self.provider.history([ticker], start).get(ticker)
+        # Os provedores não levantam exceção por ticker sem dados: omitem o ticker.
+        # Sem histórico em disco, isso é erro e entra na retentativa.
+        if df is None and start is None: raise LookupError(f"{self.provider.route(ticker).name} sem dados para {ticker}")
+        return df
+
+    def _fetch_batch(self, job):
+        provider, start, chunk = job
+        frames = self.fetcher.call(('lote', f"{provider.name} {chunk[0]}..{chunk[-1]}"), provider.history, chunk, start)
+        if frames is None: return
+        for ticker in chunk:
+            # Quem já tem histórico em disco é publicado mesmo sem barras novas
+            if ticker in frames or start is not None:
+                self._commit(ticker, frames.get(ticker))
+
+    def _commit(self, ticker, new):
+        # Grava as barras novas em disco e publica a janela de 2 anos no cache.
+        # Proventos do trecho baixado vão para o armazém de proventos, mas só de
+        # quem já teve o histórico completo carregado (senão ficaria com buracos).
+        rebase = False
+        if new is not None and any(c in new for c in ACTION_COLUMNS):
+            if 'Dividends' in new and self.dividend_store.known(ticker):
+                self.dividend_store.append(ticker, new['Dividends'])
+            rebase = self._has_new_action(ticker, new)
+            new = new.drop(columns=[c for c in ACTION_COLUMNS if c in new])
+        if rebase:
+            # Sem a janela reajustada, fica o histórico antigo e as barras novas
+            # não entram: o próximo download incremental vê o evento de novo
+            full = self._rebase(ticker)
+            if full is None: full = self.store.load(ticker)
+        elif new is not None and not new.empty:
+            full = self.store.append(ticker, new)
+        else:
+            full = self.store.load(ticker)
+        if full is None or full.empty: return None
+        df = full[full.index > full.index[-1] - pd.DateOffset(years=2)]
+        if len(df) <= 50: return None
+        df = self._compact(df)
+        # Histórico republicado: o estado incremental foi montado sobre o
+        # anterior. Com o histórico reescalado, a última barra (e a chave do
+        # memo) não muda, mas o score memorizado fica errado.
+        with self._lock:
+            self.states.pop(ticker, None)
+            if rebase: self.memo.discard(lambda key: key[0] == ticker)
+            self.cache.set(ticker, df)
+        return df
+
+    def _has_new_action(self, ticker, new):
+        # Provento ou desdobramento depois da última barra gravada. A barra
+        # repetida do início do trecho já tinha o evento quando foi gravada.
+        last = self.store.last_date(ticker)
+        if last is None: return False
+        actions = new.loc[new.index > last, [c for c in ACTION_COLUMNS if c in new]]
+        return bool((actions.fillna(0) != 0).to_numpy().any())
+
+    def _rebase(self, ticker):
+        # Com auto_adjust (e o adjustedClose do brapi), um evento novo reescala
+        # todas as barras anteriores: só acrescentar misturaria preços ajustados
+        # e não ajustados (um desdobramento viraria uma queda falsa). Baixa a
+        # janela inteira de novo e sobrescreve o histórico gravado.
+        full = self.fetcher.call(('prices', ticker), self._fetch_one, ticker, None)
+        if full is None or full.empty: return None
+        full = full.drop(columns=[c for c in ACTION_COLUMNS if c in full])
+        self.store.save(ticker, full)
+        METRICS.incr('rebased_histories_total')
+        return full
+
+    @METRICS.timed('live_update')
+    def live_update(self, tickers, max_age=0):
+        # Pregão em andamento: uma requisição em lote (por provedor) traz as barras
+        # desde a última do cache; só ela é trocada (ou a do dia acrescentada), e
+        # indicadores e score andam um passo pelo estado incremental. Nada vai ao
+        # disco: o próximo download incremental regrava o dia já fechado.
+        # Tickers cotados há menos de 'max_age' segundos ficam de fora: as abas
+        # de uma página dividem a mesma requisição. Devolve os tickers alterados.
+        now, groups = time.time(), {}
+        with self._lock:
+            for ticker in tickers:
+                df = self.cache.get(ticker, allow_stale=True)
+                if df is None or now - self._live_at.get(ticker, 0) < max_age: continue
+                self._live_at[ticker] = now
+                groups.setdefault((self.provider.route(ticker), df.index[-1]), []).append(ticker)
+        jobs = [(provider, start, group[i:i + provider.batch_size])
+                for (provider, start), group in groups.items()
+                for i in range(0, len(group), provider.batch_size)]
+        return [t for changed in self.fetcher.map(self._fetch_live, jobs) for t in changed]
+
+    def _fetch_live(self, job):
+        provider, start, chunk = job
+        frames = self.fetcher.call(('ao vivo', f"{provider.name} {chunk[0]}..{chunk[-1]}"), provider.history, chunk, start)
+        return [t for t, new in (frames or {}).items() if t in chunk and self._patch_last_bar(t, new)]
+
+    def _patch_last_bar(self, ticker, new):
+        df = self.cache.get(ticker, allow_stale=True)
+        new = new[PRICE_COLUMNS].dropna() if df is not None and new is not None else None
+        if new is None: return False
+        new = new[new.index >= df.index[-1]]
+        if new.empty: return False
+        # O bloco em cache é somente leitura e outras sessões têm views dele: frame novo
+        patched = pd.concat([df[df.index < new.index[0]], new.astype(PRICE_DTYPE)])
+        patched = self._compact(patched[patched.index > patched.index[-1] - pd.DateOffset(years=2)])
+        if patched.index[-1] == df.index[-1] and np.array_equal(patched.iloc[-1].to_numpy(), df.iloc[-1].to_numpy()):
+            return False
+        # Cotação ao vivo não conta como download: a entrada ainda vence no TTL e a
+        # revalidação grava o dia fechado e traz os proventos novos. Se um
+        # download republicou o ticker nesse meio-tempo, o remendo (feito sobre o
+        # frame antigo) é descartado.
+        close = patched['Close']
+        with self._lock:
+            if not self.cache.swap(ticker, df, patched): return False
+            score, status = self.generate_tech_score(patched, self.latest_signals(ticker, patched))
+            self.memo.set(self._memo_key(ticker, patched), {'Score': score, 'Status': status,
+                          'Close': float(close.iloc[-1]), 'PrevClose': float(close.iloc[-2])})
+        METRICS.incr('live_bars_total')
+        return True
+
+    @staticmethod
+    def _compact(df):
+        # Um único bloco float32, só OHLC e somente leitura: o cache guarda uma
+        # cópia por processo e todo chamador (sessões, gráfico, painel) recebe
+        # views dela. Quem precisar alterar faz a própria cópia.
+        values = np.ascontiguousarray(df[PRICE_COLUMNS].to_numpy(dtype=PRICE_DTYPE))
+        values.setflags(write=False)
+        return pd.DataFrame(values, index=df.index, columns=PRICE_COLUMNS, copy=False)
+
+    @staticmethod
+    def _memo_key(ticker, df):
+        # Data e fechamento da última barra: candle revisado no pregão gera chave nova
+        return ticker, df.index[-1], float(df['Close'].iloc[-1])
 
+    @METRICS.timed('score_universe')
+    def score_universe(self, tickers):
+        # Score técnico de todos os ativos numa passada vetorial sobre o painel
+        # de fechamentos, em vez de indicadores e ifs ativo a ativo. Só entra
+        # no painel quem não tem score memorizado para a última barra.
+        frames = {t: df for t, df in self.prefetch(tickers).items() if df is not None}
+        entries = {t: self.memo.get(self._memo_key(t, df)) for t, df in frames.items()}
+        stale = {t: frames[t] for t, e in entries.items() if e is None}
+        METRICS.incr('cache_hits_total', len(frames) - len(stale), cache='scores')
+        METRICS.incr('cache_misses_total', len(stale), cache='scores')
+        if stale:
+            fresh = self._score_frames(stale)
+            for ticker, row in zip(fresh.index, fresh.to_dict('records')):
+                entries[ticker] = row
+                self.memo.set(self._memo_key(ticker, stale[ticker]), row)
+        columns = ['Score', 'Status', 'Close', 'PrevClose']
+        return pd.DataFrame([[entries[t][c] for c in columns] for t in frames],
+                            index=list(frames), columns=columns)
+
+    def _score_frames(self, frames):
+        # Universos grandes: o painel é fatiado por colunas, um pedaço por processo,
+        # e os pedaços voltam concatenados (as colunas são independentes)
+        if self.processes <= 1 or len(frames) < PARALLEL_MIN:
+            return score_panel(build_panel(frames))
+        tickers = list(frames)
+        size = -(-len(tickers) // self.processes)
+        shards = [{t: frames[t]['Close'].to_numpy() for t in tickers[i:i + size]}
+                  for i in range(0, len(tickers), size)]
+        with METRICS.span('score_shards', processes=str(self.processes)):
+            return pd.concat(self._process_pool().map(score_shard, shards))
+
+    def _process_pool(self):
+        # 'spawn': o processo pai tem threads do fetcher, e fork com threads vivas
+        # pode herdar locks travados. O pool fica aberto entre chamadas.
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def analyze(self, ticker):
+        # Série de indicadores + score do ticker, da mesma entrada memorizada que
+        # alimenta a tabela: gráfico e medidores não recalculam nada
+        df = self.get_data(ticker)
+        if df is None: return None
+        key = self._memo_key(ticker, df)
+        entry = self.memo.get(key)
+        if entry is None or 'signals' not in entry:
+            inds = self.calculate_signals(df)
+            if not inds: return None
+            score, status = self.generate_tech_score(df, inds)
+            entry = {'Score': score, 'Status': status, 'Close': float(df['Close'].iloc[-1]),
+                     'PrevClose': float(df['Close'].iloc[-2]), 'signals': inds, 'df': df}
+            self.memo.set(key, entry)
+        return entry
+
+    @METRICS.timed('calculate_signals')
     def calculate_signals(self, df):
         if df is None: return None
+        from ta.trend import SMAIndicator, MACD
+        from ta.momentum import RSIIndicator
+        from ta.volatility import BollingerBands
         close = df['Close']
         i = {}
         try:
@@ -75,27 +404,45 @@ class TechnicalEngine:
             bb = BollingerBands(close, 20, 2)
             i['BB_H'] = bb.bollinger_hband()
             i['BB_L'] = bb.bollinger_lband()
-        except: return None
+        except Exception as exc:
+            METRICS.incr('swallowed_exceptions_total', source='calculate_signals', error=type(exc).__name__)
+            return None
         return i
 
+    def latest_signals(self, ticker, df):
+        # Valores atuais dos indicadores sem recalcular o histórico: só as barras
+        # a partir da última processada passam pelo estado incremental
+        state = self.states.get(ticker)
+        close = df['Close']
+        pos = close.index.get_indexer([state.last_index])[0] if state else -1
+        if pos < 0:
+            state = IndicatorState.from_close(close)
+        else:
+            for ts, x in close.iloc[pos:].items():
+                state.update(float(x), ts)
+        self.states[ticker] = state
+        return state.values()
+
     def generate_tech_score(self, df, i):
+        # 'i' pode ter as séries de calculate_signals ou os valores atuais de latest_signals
         if df is None or not i: return 0, "N/A"
+        last = lambda v: v.iloc[-1] if hasattr(v, 'iloc') else v
         score = 0
         curr = df['Close'].iloc[-1]
         
         # Tendência
-        if 'SMA20' in i and curr > i['SMA20'].iloc[-1]: score += 10
-        if 'SMA50' in i and curr > i['SMA50'].iloc[-1]: score += 15
-        if 'SMA200' in i and curr > i['SMA200'].iloc[-1]: score += 20 
+        if 'SMA20' in i and curr > last(i['SMA20']): score += 10
+        if 'SMA50' in i and curr > last(i['SMA50']): score += 15
+        if 'SMA200' in i and curr > last(i['SMA200']): score += 20 
         
         # RSI
-        rsi = i['RSI'].iloc[-1] if 'RSI' in i else 50
+        rsi = last(i['RSI']) if 'RSI' in i else 50
         if rsi < 30: score += 25
         elif 30 <= rsi <= 60: score += 10
         elif rsi > 70: score -= 10
         
         # MACD
-        if 'MACD' in i and i['MACD'].iloc[-1] > i['MACD_S'].iloc[-1]: score += 20
+        if 'MACD' in i and last(i['MACD']) > last(i['MACD_S']): score += 20
         
         final = min(100, max(0, score))
         if final >= 75: status = "🟢 COMPRA FORTE"
@@ -105,50 +452,142 @@ class TechnicalEngine:
         return final, status
 
 class FundamentalEngine:
+    # Múltiplos (.info) mudam todo dia: CACHE DE 4 HORAS.
+    # Proventos ficam no armazém em disco: o histórico completo é baixado uma
+    # única vez por ticker; depois os eventos novos chegam com as cotações.
+    def __init__(self, fetcher=None, tech_engine=None, cache_factory=TTLCache, provider=None,
+                 dividend_store=None):
+        self.fetcher = fetcher or Fetcher()
+        self.tech = tech_engine  # Fonte do preço de fechamento já em cache
+        self.provider = provider or (tech_engine.provider if tech_engine else make_provider(DATA_PROVIDER, BRAPI_TOKEN))
+        self.info_cache = cache_factory(CACHE_TTL)
+        self.misses = cache_factory(CACHE_TTL)  # Carga de proventos que falhou: não insiste até o TTL vencer
+        self.dividend_store = dividend_store or (tech_engine.dividend_store if tech_engine
+                                                 else DividendStore(os.path.join(DATA_DIR, 'dividends')))
+        self._refreshing = set()  # (cache, ticker) com revalidação em andamento
+        self._lock = threading.Lock()
+
+    @METRICS.timed('calculate_dy_manual')
     def calculate_dy_manual(self, ticker):
-        try:
-            stock = yf.Ticker(ticker)
-            hist = stock.dividends
-            if hist.empty: return 0.0
-            start_date = (datetime.now() - timedelta(days=365)).replace(tzinfo=None)
-            hist.index = hist.index.tz_localize(None)
-            divs_12m = hist[hist.index >= start_date].sum()
-            
-            hist_price = stock.history(period='5d')
-            if not hist_price.empty:
-                price = hist_price['Close'].iloc[-1]
-                if price > 0: return (divs_12m / price) * 100
-            return 0.0
-        except: return 0.0
-
-    # CACHE DE 4 HORAS: Vital para fundamentos
-    @st.cache_data(ttl=14400, show_spinner=False)
-    def get_fundamentals(_self, ticker, category):
+        hist = self.dividends(ticker)
+        if hist is None: return 0.0
+        if hist.empty: return 0.0
+        start_date = datetime.now() - timedelta(days=365)
+        divs_12m = hist[hist.index >= start_date].sum()
+
+        price = self._last_close(ticker)
+        if price and price > 0: return (divs_12m / price) * 100
+        return 0.0
+
+    def _last_close(self, ticker):
+        # Reaproveita o fechamento do TechnicalEngine; só sem ele vai à rede
+        df = self.tech.get_data(ticker) if self.tech else None
+        if df is not None: return float(df['Close'].iloc[-1])
+        start = pd.Timestamp.now().normalize() - pd.Timedelta(days=7)
+        frames = self.fetcher.call(('last_close', ticker), self.provider.history, [ticker], start)
+        hist_price = (frames or {}).get(ticker)
+        if hist_price is None or hist_price.empty: return None
+        return float(hist_price['Close'].iloc[-1])
+
+    def dividends(self, ticker):
+        # Proventos por data-com (sem fuso), do armazém; None se a carga inicial falhou
+        events = self.dividend_store.load(ticker)
+        if events is not None or ticker in self.misses: return events
+        return self.fetcher.flight.do(('dividends', ticker), self._backfill_dividends, ticker)
+
+    def _backfill_dividends(self, ticker):
+        events = self.dividend_store.load(ticker)  # Pode ter sido carregado enquanto esta chamada esperava
+        if events is not None: return events
+        hist = self.fetcher.call(('dividends', ticker), self.provider.dividends, ticker)
+        if hist is None:
+            self.misses.set(ticker, True)
+            return None
+        return self.dividend_store.append(ticker, hist)
+
+    def backfill(self, tickers):
+        # Carga inicial dos proventos de vários tickers, concorrente no pool.
+        # O worker chama para o universo todo: a página nunca espera por ela.
+        # Já carregados (ou com falha recente) ficam de fora sem tocar no pool.
+        todo = [t for t in tickers if not self.dividend_store.known(t) and t not in self.misses]
+        if todo: self.fetcher.map(self.dividends, todo)
+
+    @METRICS.timed('dy_history')
+    def dy_history(self, tickers):
+        # DY de 12 meses (%) em cada pregão do histórico gravado: painel datas x tickers
+        frames = {t: self.tech.store.load(t) for t in tickers}
+        return ttm_yield(frames, {t: self.dividends(t) for t, df in frames.items() if df is not None})
+
+    def _get_info(self, ticker):
+        # Falha também fica em cache (como dict vazio) até o TTL vencer
+        return self._cached('info', self.info_cache, ticker, lambda: self.provider.info(ticker), default={})
+
+    def _cached(self, name, cache, ticker, load, default=None):
+        # Stale-while-revalidate: entrada vencida é devolvida na hora e
+        # recarregada em segundo plano; só a primeira leitura espera a rede
+        value = cache.get(ticker, allow_stale=True)
+        METRICS.incr('cache_misses_total' if value is None else 'cache_hits_total', cache=name)
+        if value is None:
+            value = self.fetcher.flight.do((name, ticker), self._load, name, cache, ticker, load, default)
+        elif cache.is_stale(ticker):
+            self._revalidate(name, cache, ticker, load, default)
+        return value
+
+    def _load(self, name, cache, ticker, load, default):
+        value = cache.get(ticker)  # Pode ter chegado enquanto esta chamada esperava a vez
+        if value is not None: return value
+        value = self.fetcher.call((name, ticker), load)
+        if value is None: value = default
+        if value is not None: cache.set(ticker, value)
+        return value
+
+    def _revalidate(self, name, cache, ticker, load, default):
+        with self._lock:
+            if (name, ticker) in self._refreshing: return
+            self._refreshing.add((name, ticker))
+
+        def run():
+            try:
+                METRICS.incr('revalidations_total', cache=name)
+                value = self.fetcher.flight.do((name, ticker), self.fetcher.call, (name, ticker), load)
+                # Falha na revalidação mantém o valor vencido em vez de apagá-lo
+                if value is not None: cache.set(ticker, value)
+            finally:
+                with self._lock: self._refreshing.discard((name, ticker))
+        self.fetcher.background(run)
+
+    @METRICS.timed('get_fundamentals')
+    def get_fundamentals(self, ticker, category):
         if category == 'Commodities': return None
-        
-        # Tenta pegar DY pronto, se falhar, calcula manual
-        dy_manual = _self.calculate_dy_manual(ticker)
-        
-        try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
+        info = self._get_info(ticker)
             
-            # Se a API falhar, usamos o DY calculado manualmente e zeramos o resto
-            if not info or len(info) < 2:
-                return {'P/L': 0, 'P/VP': 0, 'DY': dy_manual, 'ROE': 0}
-
-            dy_api = info.get('dividendYield', 0)
-            dy_final = (dy_api * 100) if dy_api and dy_api > 0 else dy_manual
-
-            return {
-                'P/L': info.get('trailingPE', 0),
-                'P/VP': info.get('priceToBook', 0),
-                'DY': dy_final,
-                'ROE': (info.get('returnOnEquity', 0) or 0) * 100
-            }
-        except:
-            # Fallback total
-            return {'P/L': 0, 'P/VP': 0, 'DY': dy_manual, 'ROE': 0}
+        # Se a API falhar, usamos o DY calculado manualmente e zeramos o resto
+        if not info or len(info) < 2:
+            return {'P/L': 0, 'P/VP': 0, 'DY': self.calculate_dy_manual(ticker), 'ROE': 0}
+
+        # DY pronto da API; o manual (proventos) só como reserva
+        dy_api = info.get('dividendYield', 0)
+        dy_final = (dy_api * 100) if dy_api and dy_api > 0 else self.calculate_dy_manual(ticker)
+        return {
+            'P/L': info.get('trailingPE', 0),
+            'P/VP': info.get('priceToBook', 0),
+            'DY': dy_final,
+            'ROE': (info.get('returnOnEquity', 0) or 0) * 100
+        }
+
+    def prefetch(self, items):
+        # items: {ticker: categoria}. Busca concorrente no pool compartilhado
+        # Entradas vencidas contam como presentes: get_fundamentals as revalida
+        pending = {t: c for t, c in items.items()
+                   if c != 'Commodities' and self.info_cache.get(t, allow_stale=True) is None}
+        self.fetcher.map(lambda t: self.get_fundamentals(t, pending[t]), pending)
+
+    def refresh(self, items):
+        # Atualização manual: derruba o .info só dos tickers pedidos. Proventos
+        # novos chegam com o download de cotações (TechnicalEngine.refresh)
+        for ticker in items:
+            self.info_cache.invalidate(ticker)
+            self.misses.invalidate(ticker)
+        self.prefetch(items)
 
     def generate_fund_score(self, data, category):
         if not data: return 0, "N/A"
@@ -0,0 +1,192 @@
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from metrics import METRICS
+
+
+# --- ALERTAS ---
+# Regras do usuário (alerts.json) sobre a saída dos scores e os indicadores da
+# última barra. As regras são compiladas em vetores (campo, operador, limite,
+# filtros) e avaliadas juntas contra o universo inteiro: uma matriz ativos x
+# regras por atualização, sem laço por regra nem por ativo. Disparo por borda:
+# só alerta quando a condição passa de falsa a verdadeira.
+#
+# Regra: {"name": "...", "field": "rsi", "op": "<", "value": 30}
+#   "ref" no lugar de "value" compara com outro campo ("price" > "sma200":
+#   cruzamento da média de 200); "category" e "ticker" restringem a regra.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_PATH = os.environ.get("AGRO_ALERT_RULES", os.path.join(BASE_DIR, 'alerts.json'))
+LOG_PATH = os.path.join(BASE_DIR, 'data', 'alerts.jsonl')
+WEBHOOK_URL = os.environ.get("AGRO_ALERT_WEBHOOK")
+
+# Campo da regra -> coluna do frame de alertas (pipeline.build_alert_frame)
+FIELDS = {'score_tec': 'Score Téc.', 'score_fund': 'Score Fund.', 'status': 'Status', 'dy': 'DY%',
+          'price': 'Preço', 'var': 'Var%', 'rsi': 'RSI', 'sma20': 'SMA20', 'sma50': 'SMA50',
+          'sma200': 'SMA200', 'macd': 'MACD', 'macd_signal': 'MACD_S'}
+TEXT_FIELDS = {'status'}
+OPS = {'>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal,
+       '==': np.equal, '!=': np.not_equal}
+
+
+def load_rules(path=RULES_PATH):
+    if not os.path.exists(path): return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# --- DESTINOS ---
+class FileSink:
+    # Uma linha JSON por alerta, só acrescentando
+    def __init__(self, path=LOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, alerts):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            for alert in alerts: f.write(json.dumps(alert, ensure_ascii=False) + '\n')
+
+
+class WebhookSink:
+    # Um POST com o lote de alertas da atualização
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def emit(self, alerts):
+        from providers import requests
+        requests.post(self.url, json={'alerts': alerts}, timeout=self.timeout).raise_for_status()
+
+
+def default_sinks():
+    return [FileSink()] + ([WebhookSink(WEBHOOK_URL)] if WEBHOOK_URL else [])
+
+
+class AlertEngine:
+    def __init__(self, rules, sinks=(), history=200):
+        self.rules = [self._check(r) for r in rules]
+        self.sinks = list(sinks)
+        self.recent = deque(maxlen=history)  # Últimos alertas disparados, mais novo no fim
+        self._state = None  # (tickers, matriz tickers x regras) da última avaliação
+        self._vocab = {}  # Texto (status, categoria, ticker) -> código numérico
+        self._lock = threading.Lock()
+        self._compile()
+
+    @classmethod
+    def from_file(cls, path=RULES_PATH, sinks=None):
+        return cls(load_rules(path), default_sinks() if sinks is None else sinks)
+
+    @staticmethod
+    def _check(rule):
+        # Regra inválida é erro de configuração: falha na carga, não na avaliação
+        if rule.get('field') not in FIELDS: raise ValueError(f"campo desconhecido na regra {rule.get('name')}: {rule.get('field')}")
+        if rule.get('op') not in OPS: raise ValueError(f"operador desconhecido na regra {rule.get('name')}: {rule.get('op')}")
+        if rule['field'] in TEXT_FIELDS and rule['op'] not in ('==', '!='):
+            raise ValueError(f"regra {rule.get('name')}: texto só aceita '==' ou '!='")
+        if ('value' in rule) == ('ref' in rule): raise ValueError(f"regra {rule.get('name')}: use 'value' ou 'ref'")
+        if 'ref' in rule and rule['ref'] not in FIELDS: raise ValueError(f"campo desconhecido na regra {rule.get('name')}: {rule['ref']}")
+        return rule
+
+    def _code(self, text):
+        return float(self._vocab.setdefault(text, len(self._vocab)))
+
+    def _encode(self, value):
+        return self._code(value) if isinstance(value, str) else float(value)
+
+    def _compile(self):
+        # Regras ordenadas por (operador, campo, referência): cada grupo vira uma
+        # fatia contígua de colunas e é avaliado numa só comparação com
+        # broadcasting. O número de grupos é limitado pelos campos e operadores,
+        # não pelo número de regras.
+        fields = list(FIELDS)
+        key = lambda r: (list(OPS).index(r['op']), fields.index(r['field']), fields.index(r['ref']) if 'ref' in r else -1)
+        self.rules = sorted(self.rules, key=key)
+        self._ids = [r.get('name') or f"regra {i}" for i, r in enumerate(self.rules)]
+        if len(set(self._ids)) < len(self._ids): raise ValueError("nomes de regra repetidos")
+        self._left = np.array([fields.index(r['field']) for r in self.rules], dtype=int)
+        self._right = np.array([fields.index(r['ref']) if 'ref' in r else -1 for r in self.rules], dtype=int)
+        self._value = np.array([self._encode(r['value']) if 'value' in r else np.nan for r in self.rules])
+        self._category = np.array([self._code(r['category']) if r.get('category') else -1 for r in self.rules])
+        self._ticker = np.array([self._code(r['ticker']) if r.get('ticker') else -1 for r in self.rules])
+        keys = [key(r) for r in self.rules]
+        starts = [i for i in range(len(keys)) if i == 0 or keys[i] != keys[i - 1]]
+        self._groups = [(list(OPS.values())[keys[a][0]], keys[a][1], keys[a][2], slice(a, b))
+                        for a, b in zip(starts, starts[1:] + [len(keys)])]
+        self._filtered = np.flatnonzero((self._category >= 0) | (self._ticker >= 0))
+
+    def _codes(self, values):
+        # Texto desconhecido das regras não casa com nada: NaN
+        return pd.Series(values).map(self._vocab).to_numpy(dtype=float)
+
+    def _matrix(self, frame):
+        columns = []
+        for field, column in FIELDS.items():
+            if column not in frame: columns.append(np.full(len(frame), np.nan))
+            elif field in TEXT_FIELDS: columns.append(self._codes(frame[column]))
+            else: columns.append(pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=float))
+        return np.column_stack(columns) if columns else np.empty((len(frame), 0))
+
+    @METRICS.timed('alerts_evaluate')
+    def evaluate(self, frame, deliver=True):
+        # frame: uma linha por ticker (índice), colunas de FIELDS e 'Categoria'.
+        # Devolve os alertas disparados agora (e os entrega aos destinos, se 'deliver').
+        if not self.rules or frame.empty: return []
+        x = self._matrix(frame)
+        hit = np.empty((len(frame), len(self.rules)), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for op, left, right, cols in self._groups:
+                target = x[:, right, None] if right >= 0 else self._value[None, cols]
+                op(x[:, left, None], target, out=hit[:, cols])
+        if len(self._filtered):
+            f = self._filtered
+            categories = self._codes(frame['Categoria']) if 'Categoria' in frame else np.full(len(frame), np.nan)
+            hit[:, f] &= (self._category[f] < 0) | (categories[:, None] == self._category[f])
+            hit[:, f] &= (self._ticker[f] < 0) | (self._codes(frame.index)[:, None] == self._ticker[f])
+
+        with self._lock:
+            if self._state is None:
+                prev = hit  # Primeira avaliação é a referência: nada dispara
+            elif self._state[0].equals(frame.index):
+                prev = self._state[1]
+            else:
+                # Ticker novo entra com o estado atual, sem disparar
+                pos = self._state[0].get_indexer(frame.index)
+                prev = np.where((pos >= 0)[:, None], self._state[1][pos], hit)
+            self._state = (frame.index, hit)
+            rows, cols = np.nonzero(hit & ~prev)
+            fired = self._alerts(frame, x, rows, cols)
+            self.recent.extend(fired)
+        METRICS.incr('alerts_fired_total', len(fired))
+        if fired and deliver: self._deliver(fired)
+        return fired
+
+    def _alerts(self, frame, x, rows, cols):
+        # Valores tirados das matrizes já montadas, em bloco: o custo é por
+        # alerta disparado, não por célula avaliada
+        now = datetime.now().isoformat(timespec='seconds')
+        names = list(FIELDS)
+        left = self._left[cols]
+        value = x[rows, left]
+        target = np.where(self._right[cols] >= 0, x[rows, np.maximum(self._right[cols], 0)], self._value[cols])
+        texts = {f: frame[FIELDS[f]].to_numpy() for f in TEXT_FIELDS if FIELDS[f] in frame}
+        tickers = frame.index.to_numpy()
+        return [{'at': now, 'rule': self._ids[c], 'ticker': tickers[r], 'field': names[f], 'op': self.rules[c]['op'],
+                 'value': texts[names[f]][r] if names[f] in texts else float(v),
+                 'target': self.rules[c]['value'] if names[f] in texts else float(t)}
+                for r, c, f, v, t in zip(rows, cols, left, value, target)]
+
+    def _deliver(self, alerts):
+        # Falha num destino não impede os outros nem a atualização dos dados
+        for sink in self.sinks:
+            try:
+                sink.emit(alerts)
+            except Exception as exc:
+                METRICS.incr('swallowed_exceptions_total', source='alerts', error=type(exc).__name__)
+
+    def recent_alerts(self):
+        with self._lock:
+            return list(self.recent)
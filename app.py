@@ -2,12 +2,23 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from agro_analytics import AgroDatabase, TechnicalEngine, FundamentalEngine
-import uuid
+import agro_analytics
+from agro_analytics import AgroDatabase, TechnicalEngine, FundamentalEngine, SNAPSHOT_PATH, CACHE_TTL
+from fetcher import Fetcher
+from pipeline import build_results, build_chart_series, build_risk, build_alert_frame, build_dy_history
+from alerts import AlertEngine
+from risk import RiskModel
+from charting import RANGES, DEFAULT_RANGE, prepare_chart
+from snapshot import read_snapshot, snapshot_mtime
+from metrics import METRICS
 import time
 
+rerun_start = time.perf_counter()
+
 # --- CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(page_title="AgroMonitor Premium V6.5", page_icon="🌾", layout="wide")
+agro_analytics.BRAPI_TOKEN = st.secrets.get("BRAPI_TOKEN", agro_analytics.BRAPI_TOKEN)
+agro_analytics.DATA_PROVIDER = st.secrets.get("DATA_PROVIDER", agro_analytics.DATA_PROVIDER)
 
 # --- CSS EXECUTIVO ---
 st.markdown("""
@@ -28,19 +39,51 @@ st.markdown("""
 # --- CARREGAMENTO ---
 @st.cache_resource
 def load_system():
-    return AgroDatabase(), TechnicalEngine(), FundamentalEngine()
+    # Um único fetcher: pool e rate limit compartilhados pelos dois motores
+    fetcher = Fetcher()
+    tech = TechnicalEngine(fetcher=fetcher)
+    return AgroDatabase(), tech, FundamentalEngine(fetcher=fetcher, tech_engine=tech)
 
 db, tech_eng, fund_eng = load_system()
 
+# --- SNAPSHOT DO WORKER ---
+# Com o worker rodando (python worker.py), a página só lê o snapshot do disco
+# e nunca espera pela rede. Sem snapshot, calcula tudo aqui mesmo. Só o
+# snapshot atual fica em memória: cada gravação do worker troca a chave (mtime).
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_snapshot(mtime):
+    return read_snapshot(SNAPSHOT_PATH)
+
+snapshot = load_snapshot(snapshot_mtime(SNAPSHOT_PATH))
+WORKER_MAX_AGE = 2 * 3600  # Snapshot mais velho que isso: o worker parou
+
+def worker_running():
+    return bool(snapshot) and time.time() - snapshot['generated_at'] < WORKER_MAX_AGE
+
 # --- SIDEBAR ---
 with st.sidebar:
     st.title("🚜 AgroMonitor V6.5")
     min_score = st.slider("Score Técnico Mínimo", 0, 100, 30)
     search_ticker = st.text_input("🔍 Buscar Ativo", "").upper()
+    show_diagnostics = st.checkbox("🩺 Diagnóstico", value=False)
+    # Ao vivo: a cada intervalo, só a classificação e os KPIs são redesenhados,
+    # com a última barra dos ativos em tela atualizada por uma requisição em lote
+    live = st.toggle("⏱️ Ao vivo", value=False)
+    live_every = st.select_slider("Intervalo (s)", [15, 30, 60, 120], value=30, disabled=not live)
     st.markdown("---")
-    # Botão para limpar cache se precisar
-    if st.button("🔄 Limpar Cache e Atualizar", type="primary"):
-        st.cache_data.clear()
+    # Atualização manual só do que foi pedido: tudo, uma categoria ou um ativo.
+    # O resto segue no cache (vencido o TTL, é revalidado em segundo plano).
+    # Lendo o snapshot, a página não usa o que os motores baixam: quem atualiza é o worker.
+    from_worker = bool(snapshot) and not live
+    scope = st.selectbox("Atualizar", ["Tudo"] + list(db.assets) + db.get_tickers(), disabled=from_worker)
+    if from_worker: st.caption("Dados do worker, atualizados a cada ciclo dele. Ligue o ao vivo para baixar aqui.")
+    if st.button("🔄 Atualizar Dados", type="primary", disabled=from_worker):
+        if scope == "Tudo": items = {t: db.get_info(t)[1] for t in db.get_tickers()}
+        elif scope in db.assets: items = {t: scope for t in db.assets[scope]}
+        else: items = {scope: db.get_info(scope)[1]}
+        with st.spinner(f"Atualizando {scope}..."):
+            tech_eng.refresh(list(items))
+            fund_eng.refresh(items)
         st.rerun()
 
 # --- HEADER ---
@@ -49,8 +92,13 @@ with col1:
     st.title("Monitor Executivo do Agronegócio")
 with col2:
     st.markdown(f"*{pd.Timestamp.now().strftime('%d/%m/%Y')}*")
+    if snapshot:
+        st.caption(f"Dados de {pd.Timestamp(snapshot['generated_at'], unit='s', tz='America/Sao_Paulo'):%d/%m %H:%M}")
 
 # --- FUNÇÃO DE GAUGE ---
+# Figuras em cache_resource: mesma entrada, mesmo objeto, sem reconstruir.
+# Com chaves estáveis, o navegador reaproveita o gráfico entre reruns.
+@st.cache_resource(max_entries=256, show_spinner=False)
 def create_gauge(value, title):
     fig = go.Figure(go.Indicator(
         mode = "gauge+number",
@@ -65,156 +113,306 @@ def create_gauge(value, title):
     fig.update_layout(height=150, margin=dict(l=20, r=20, t=30, b=20), paper_bgcolor="rgba(0,0,0,0)")
     return fig
 
-# --- RENDERIZAÇÃO ---
-def render_premium_tab(category_name, assets_dict):
-    results = []
+# --- GRÁFICO DE ANÁLISE ---
+# Período recortado e série reduzida no servidor (charting.py); linhas em WebGL
+@st.cache_resource(max_entries=128, show_spinner=False)
+@METRICS.timed('build_figure')
+def create_chart(ticker, period, data_version):
+    df_chart = get_chart_series(ticker)
+    if df_chart is None: return None
+    c = prepare_chart(df_chart, period)
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.05, row_heights=[0.7, 0.3])
     
-    # BARRA DE PROGRESSO
-    progress_bar = st.progress(0)
-    total_assets = len(assets_dict)
+    candles = c['candles']
+    fig.add_trace(go.Candlestick(x=candles.index, open=candles['Open'], high=candles['High'],
+                               low=candles['Low'], close=candles['Close'],
+                               name='Preço (semanal)' if c['weekly'] else 'Preço'), row=1, col=1)
+    lines = c['lines']
+    if 'SMA20' in lines:
+        fig.add_trace(go.Scattergl(x=lines['SMA20'].index, y=lines['SMA20'], name='Média 20', line=dict(color='orange')), row=1, col=1)
+    if 'SMA200' in lines:
+        fig.add_trace(go.Scattergl(x=lines['SMA200'].index, y=lines['SMA200'], name='Média 200', line=dict(color='blue')), row=1, col=1)
     
-    for i, (ticker, name) in enumerate(assets_dict.items()):
-        if search_ticker and search_ticker not in ticker: continue
-        
-        progress_bar.progress((i + 1) / total_assets)
-        
-        # O delay agora é tratado internamente no agro_analytics para ser eficiente
-        df = tech_eng.get_data(ticker)
-        
-        if df is not None:
-            inds = tech_eng.calculate_signals(df)
-            if not inds: continue
-            
-            t_score, t_status = tech_eng.generate_tech_score(df, inds)
-            
-            if t_score >= min_score:
-                f_data = fund_eng.get_fundamentals(ticker, category_name)
-                f_score, f_status = fund_eng.generate_fund_score(f_data, category_name)
-                
-                price = df['Close'].iloc[-1]
-                var_pct = ((price / df['Close'].iloc[-2]) - 1) * 100
-                dy_val = f_data['DY'] if f_data else 0
-                
-                insight_text = fund_eng.generate_insight(t_score, f_score, dy_val, category_name)
-                
-                results.append({
-                    "Ticker": ticker.replace('.SA', ''),
-                    "Nome": name,
-                    "Preço": price,
-                    "Var%": var_pct,
-                    "Score Téc.": t_score,
-                    "Score Fund.": f_score,
-                    "DY%": dy_val,
-                    "Insight": insight_text,
-                    "Status": t_status
-                })
-    
-    progress_bar.empty()
+    if 'MACD' in lines:
+        fig.add_trace(go.Scattergl(x=lines['MACD'].index, y=lines['MACD'], name='MACD', line=dict(color='purple')), row=2, col=1)
+        fig.add_trace(go.Bar(x=c['hist'].index, y=c['hist'], name='Hist', marker_color='gray'), row=2, col=1)
     
+    fig.update_layout(height=500, template="plotly_white", xaxis_rangeslider_visible=False, margin=dict(l=10, r=10, t=10, b=10))
+    return fig
+
+# --- RENDERIZAÇÃO ---
+# Tabela completa calculada uma vez por versão dos dados. Mexer no slider ou
+# na busca só filtra o frame em cache; a versão muda quando os caches dos
+# motores recebem dados novos (inclusive de uma revalidação em segundo plano).
+# cache_resource: um único objeto para todas as sessões, sem cópia por rerun,
+# e sessões simultâneas esperam o mesmo cálculo em vez de repeti-lo.
+# Quem lê não altera o frame: os filtros criam frames novos.
+@st.cache_resource(ttl=CACHE_TTL, max_entries=32, show_spinner=False)
+def compute_results(category, data_version):
+    return build_results(db, tech_eng, fund_eng, category)
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=256, show_spinner=False)
+def compute_chart_series(ticker, data_version):
+    return build_chart_series(tech_eng, ticker)
+
+def data_version():
+    return tech_eng.cache.version, fund_eng.info_cache.version, fund_eng.dividend_store.version
+
+# DY de 12 meses de cada pregão gravado, em pontos semanais: tendência do
+# rendimento e posição relativa dos ativos ao longo do tempo
+@st.cache_resource(ttl=CACHE_TTL, max_entries=16, show_spinner=False)
+def compute_dy_history(tickers, data_version):
+    return build_dy_history(fund_eng, tickers)
+
+def get_dy_history(tickers):
+    # Com snapshot, a série vem pronta do worker: nenhuma carga de proventos na página
+    if snapshot and not live:
+        dy = snapshot['dy_history']
+        dy = dy[[t for t in tickers if t in dy]]
+    else:
+        dy = compute_dy_history(tuple(tickers), (tech_eng.cache.version, fund_eng.dividend_store.version))
+    return dy.rename(columns=db.display)
+
+# Um RiskModel por processo: as somas da janela sobrevivem entre versões dos
+# dados e cada versão nova só aplica as barras que mudaram
+@st.cache_resource
+def load_risk_model():
+    return RiskModel()
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=4, show_spinner=False)
+def compute_risk(data_version):
+    return build_risk(db, tech_eng, load_risk_model())
+
+def get_risk():
+    if snapshot and not live and snapshot.get('risk') is not None: return snapshot['risk']
+    return compute_risk(tech_eng.cache.version)
+
+# Mapa de calor em cache por versão: no máximo MAX_HEATMAP linhas e colunas
+@st.cache_resource(max_entries=4, show_spinner=False)
+def create_heatmap(data_version):
+    view = get_risk()['heatmap']
+    fig = go.Figure(go.Heatmap(z=view.to_numpy(), x=list(view.columns), y=list(view.index),
+                               colorscale='RdBu_r', zmin=-1, zmax=1, zmid=0,
+                               hovertemplate="%{y} x %{x}: %{z:.2f}<extra></extra>"))
+    fig.update_layout(height=650, template="plotly_white", margin=dict(l=10, r=10, t=10, b=10),
+                      yaxis=dict(autorange='reversed'))
+    return fig
+
+# Regras de alerta avaliadas uma vez por versão dos dados, para todas as
+# sessões: o estado das regras é do processo, e o disparo, por borda
+@st.cache_resource
+def load_alerts():
+    return AlertEngine.from_file()
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def compute_alerts(data_version, deliver):
+    engine = load_alerts()
+    engine.evaluate(build_alert_frame(db, tech_eng, {c: get_results(c) for c in db.assets}), deliver=deliver)
+    return engine.recent_alerts()
+
+def get_alerts():
+    if snapshot and not live: return snapshot.get('alerts', [])
+    # Com o worker rodando, quem entrega (arquivo, webhook) é ele: ao vivo, a
+    # página só avalia para mostrar, senão cada alerta sairia duas vezes
+    return compute_alerts(data_version(), not worker_running())
+
+def get_results(category):
+    # Ao vivo, a tabela sai dos motores: o snapshot do worker não recebe as barras do pregão
+    if snapshot and not live: return snapshot['categories'].get(category, pd.DataFrame())
+    return compute_results(category, data_version())
+
+def get_chart_series(ticker):
+    if snapshot: return snapshot['charts'].get(ticker)
+    return compute_chart_series(ticker, tech_eng.cache.version)
+
+def chart_version():
+    return snapshot['version'] if snapshot else tech_eng.cache.version
+
+def filtered_results(category):
+    df_res = get_results(category)
+    if not df_res.empty:
+        # Filtros de tela: máscaras vetoriais sobre o frame em cache
+        mask = df_res['Score Téc.'] >= min_score
+        if search_ticker: mask &= df_res['Ativo'].isin(db.search(search_ticker))
+        df_res = df_res[mask]
+    return df_res
+
+# Ativos em tela em todas as abas: a primeira aba a disparar cota todos de uma vez
+on_screen = st.session_state.setdefault('on_screen', set())
+on_screen.clear()
+
+@st.fragment(run_every=live_every if live else None)
+def render_ranking(category_name, category):
+    if live and on_screen:
+        tech_eng.live_update(sorted(on_screen), max_age=live_every / 2)
+    if live: get_alerts()  # Cotação nova: as regras rodam já, não só no próximo rerun completo
+    df_res = filtered_results(category)
+    if df_res.empty: return
+    on_screen.update(df_res['Ativo'])
+    top_asset = df_res.iloc[0]
+
     # DASHBOARD
-    if results:
-        df_res = pd.DataFrame(results).sort_values("Score Téc.", ascending=False)
-        top_asset = df_res.iloc[0]
-        
-        k1, k2, k3, k4 = st.columns(4)
-        k1.metric("Oportunidades", len(df_res))
-        k2.metric("Melhor Ativo", top_asset['Ticker'], delta=f"{top_asset['Score Téc.']} pts")
-        
-        if "Fiagros" in category_name:
-            avg_dy = df_res['DY%'].mean()
-            k3.metric("Média de Dividendos", f"{avg_dy:.2f}%", delta="Anual")
-        else:
-            avg_var = df_res['Var%'].mean()
-            k3.metric("Variação do Setor", f"{avg_var:.2f}%")
-            
-        k4.metric("Sentimento Geral", "Otimista" if df_res['Score Téc.'].mean() > 50 else "Cauteloso")
-        
-        st.divider()
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Oportunidades", len(df_res))
+    k2.metric("Melhor Ativo", top_asset['Ticker'], delta=f"{top_asset['Score Téc.']} pts")
+    
+    if "Fiagros" in category_name:
+        avg_dy = df_res['DY%'].mean()
+        k3.metric("Média de Dividendos", f"{avg_dy:.2f}%", delta="Anual")
+    else:
+        avg_var = df_res['Var%'].mean()
+        k3.metric("Variação do Setor", f"{avg_var:.2f}%")
         
-        col_table, col_detail = st.columns([2, 1])
+    k4.metric("Sentimento Geral", "Otimista" if df_res['Score Téc.'].mean() > 50 else "Cauteloso")
+    
+    st.divider()
+    
+    col_table, col_detail = st.columns([2, 1])
+    
+    with col_table:
+        st.subheader("📋 Classificação de Mercado")
+        st.dataframe(
+            df_res,
+            column_config={
+                "Score Téc.": st.column_config.ProgressColumn("Técnico", min_value=0, max_value=100, format="%d"),
+                "Score Fund.": st.column_config.ProgressColumn("Fundam.", min_value=0, max_value=100, format="%d"),
+                "Preço": st.column_config.NumberColumn("Preço", format="R$ %.2f"),
+                "Var%": st.column_config.NumberColumn("Var (1d)", format="%.2f%%"),
+                "DY%": st.column_config.NumberColumn("DY (12m)", format="%.1f%%"),
+                "Insight": st.column_config.TextColumn("Análise IA", width="medium"),
+                "Ativo": None,
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+    
+    with col_detail:
+        st.markdown(f"### 🏆 Destaque: {top_asset['Ticker']}")
+        st.info(top_asset['Insight'])
         
-        with col_table:
-            st.subheader("📋 Classificação de Mercado")
-            st.dataframe(
-                df_res,
-                column_config={
-                    "Score Téc.": st.column_config.ProgressColumn("Técnico", min_value=0, max_value=100, format="%d"),
-                    "Score Fund.": st.column_config.ProgressColumn("Fundam.", min_value=0, max_value=100, format="%d"),
-                    "Preço": st.column_config.NumberColumn("Preço", format="R$ %.2f"),
-                    "Var%": st.column_config.NumberColumn("Var (1d)", format="%.2f%%"),
-                    "DY%": st.column_config.NumberColumn("DY (12m)", format="%.1f%%"),
-                    "Insight": st.column_config.TextColumn("Análise IA", width="medium"),
-                },
-                hide_index=True,
-                use_container_width=True
+        g1, g2 = st.columns(2)
+        # Chaves estáveis por aba: únicas na página (evita o
+        # StreamlitDuplicateElementId) e iguais entre reruns
+        with g1: 
+            st.plotly_chart(
+                create_gauge(int(top_asset['Score Téc.']), "Técnico"), 
+                use_container_width=True, 
+                key=f"gauge_tec_{category_name}"
+            )
+        with g2: 
+            st.plotly_chart(
+                create_gauge(int(top_asset['Score Fund.']), "Fundamentos"), 
+                use_container_width=True, 
+                key=f"gauge_fund_{category_name}"
             )
         
-        with col_detail:
-            st.markdown(f"### 🏆 Destaque: {top_asset['Ticker']}")
-            st.info(top_asset['Insight'])
-            
-            g1, g2 = st.columns(2)
-            # CORREÇÃO DE ID: Gera UUIDs aleatórios para garantir unicidade absoluta
-            # Isso resolve o StreamlitDuplicateElementId de vez
-            id_tec = str(uuid.uuid4())
-            id_fund = str(uuid.uuid4())
-            
-            with g1: 
-                st.plotly_chart(
-                    create_gauge(top_asset['Score Téc.'], "Técnico"), 
-                    use_container_width=True, 
-                    key=id_tec
-                )
-            with g2: 
-                st.plotly_chart(
-                    create_gauge(top_asset['Score Fund.'], "Fundamentos"), 
-                    use_container_width=True, 
-                    key=id_fund
-                )
-            
-            if top_asset['DY%'] > 0:
-                st.success(f"💰 **Dividend Yield:** {top_asset['DY%']:.2f}% ao ano")
-        
+        if top_asset['DY%'] > 0:
+            st.success(f"💰 **Dividend Yield:** {top_asset['DY%']:.2f}% ao ano")
+
+def render_premium_tab(category_name, category):
+    render_ranking(category_name, category)
+    # Gráfico fora do fragmento: só é refeito nos reruns completos
+    df_res = filtered_results(category)
+    if not df_res.empty:
+        top_asset = df_res.iloc[0]
         st.markdown("---")
         st.subheader(f"📈 Análise Gráfica: {top_asset['Ticker']}")
         
-        full_ticker = top_asset['Ticker']
-        if category_name != 'Commodities' and ".SA" not in full_ticker: full_ticker += ".SA"
-        elif category_name == 'Commodities': 
-             for k, v in assets_dict.items():
-                 if top_asset['Ticker'] in k: full_ticker = k; break
-        
-        # Como está cacheado, isso não vai bater na API de novo
-        df_chart = tech_eng.get_data(full_ticker)
-        if df_chart is not None:
-            inds = tech_eng.calculate_signals(df_chart)
-            
-            fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.05, row_heights=[0.7, 0.3])
-            
-            fig.add_trace(go.Candlestick(x=df_chart.index, open=df_chart['Open'], high=df_chart['High'],
-                                       low=df_chart['Low'], close=df_chart['Close'], name='Preço'), row=1, col=1)
-            if 'SMA20' in inds:
-                fig.add_trace(go.Scatter(x=df_chart.index, y=inds['SMA20'], name='Média 20', line=dict(color='orange')), row=1, col=1)
-            if 'SMA200' in inds:
-                fig.add_trace(go.Scatter(x=df_chart.index, y=inds['SMA200'], name='Média 200', line=dict(color='blue')), row=1, col=1)
-            
-            if 'MACD' in inds:
-                fig.add_trace(go.Scatter(x=df_chart.index, y=inds['MACD'], name='MACD', line=dict(color='purple')), row=2, col=1)
-                fig.add_trace(go.Bar(x=df_chart.index, y=inds['MACD']-inds['MACD_S'], name='Hist', marker_color='gray'), row=2, col=1)
-            
-            fig.update_layout(height=500, template="plotly_white", xaxis_rangeslider_visible=False, margin=dict(l=10, r=10, t=10, b=10))
-            
-            id_chart = str(uuid.uuid4())
-            st.plotly_chart(fig, use_container_width=True, key=id_chart)
+        period = st.segmented_control("Período", list(RANGES), default=DEFAULT_RANGE,
+                                      key=f"range_{category_name}") or DEFAULT_RANGE
+        # Série pronta (snapshot ou cache): não recalcula os indicadores
+        fig = create_chart(top_asset['Ativo'], period, chart_version())
+        if fig is not None:
+            st.plotly_chart(fig, use_container_width=True, key=f"chart_{category_name}")
+
+        if "Fiagros" in category_name:
+            st.subheader("💰 Dividend Yield (12m) ao longo do tempo")
+            dy = get_dy_history(df_res['Ativo'])
+            if not dy.empty: st.line_chart(dy, y_label="DY %")
 
     else:
         st.warning(f"Nenhum ativo encontrado em '{category_name}' com os filtros atuais.")
 
+def render_risk_tab():
+    risk = get_risk()
+    if risk is None:
+        st.warning("Cotações insuficientes para a matriz de correlação.")
+        return
+    table = risk['table']
+    k1, k2, k3 = st.columns(3)
+    k1.metric("Ativos", len(table))
+    k2.metric("Correlação Média", f"{risk['mean_corr']:.2f}")
+    k3.metric("Janela", f"{risk['window']} pregões")
+    st.subheader("🧮 Correlação dos Retornos Diários")
+    version = snapshot['version'] if snapshot and not live and snapshot.get('risk') is not None else tech_eng.cache.version
+    st.plotly_chart(create_heatmap(version), use_container_width=True, key="risk_heatmap")
+    if len(risk['members']) < len(table):
+        with st.expander("Composição dos grupos"):
+            for name, tickers in risk['members'].items():
+                st.caption(f"**{name}**: {', '.join(db.display(t) for t in tickers)}")
+    st.subheader("📉 Volatilidade e Diversificação")
+    st.dataframe(table, column_config={
+        "Vol 1m %": st.column_config.NumberColumn("Vol 1m", format="%.1f%%"),
+        "Vol 12m %": st.column_config.NumberColumn("Vol 12m", format="%.1f%%"),
+        "Corr. média": st.column_config.NumberColumn("Corr. média", format="%.2f"),
+    }, hide_index=True, use_container_width=True)
+
+# --- DOWNLOAD EM LOTE ---
+# Um punhado de requisições multi-ticker em vez de uma por ativo. Fundamentos
+# e proventos também vêm antes das tabelas e do gráfico de DY: depois daqui
+# ninguém grava nos caches da chave data_version() durante o cálculo, e cada
+# categoria é calculada uma vez só.
+if not snapshot or live:
+    with st.spinner("Carregando cotações..."):
+        tech_eng.prefetch(db.get_tickers())
+        items = {t: db.get_info(t)[1] for t in db.get_tickers()}
+        fund_eng.prefetch(items)
+        fund_eng.backfill([t for t, cat in items.items() if cat != 'Commodities'])
+
 # --- ABAS ---
-tabs = st.tabs(["🌱 Fiagros (Renda)", "🇧🇷 Ações (Crescimento)", "🌎 Global (BDRs)", "🛢️ Commodities"])
+tabs = st.tabs(["🌱 Fiagros (Renda)", "🇧🇷 Ações (Crescimento)", "🌎 Global (BDRs)", "🛢️ Commodities", "🧮 Risco"])
+
+TAB_CATEGORIES = [("Fiagros", 'Fiagros (Renda Mensal)'), ("Ações", 'Ações (Crescimento)'),
+                  ("Global", 'Global (BDRs/ETFs)'), ("Commodities", 'Commodities')]
+for tab, (category_name, category) in zip(tabs, TAB_CATEGORIES):
+    with tab, METRICS.span('render_premium_tab', tab=category_name):
+        render_premium_tab(category_name, category)
+with tabs[-1], METRICS.span('render_risk_tab'):
+    render_risk_tab()
+
+# --- ALERTAS ---
+alerts = get_alerts()
+if alerts:
+    with st.sidebar.expander(f"🔔 Alertas ({len(alerts)})"):
+        for alert in reversed(alerts[-20:]):
+            value = alert['value'] if isinstance(alert['value'], str) else f"{alert['value']:.2f}"
+            st.caption(f"{alert['at'][5:16].replace('T', ' ')} · **{db.display(alert['ticker'])}** · {alert['rule']} ({value})")
+
+# --- FALHAS DE DOWNLOAD ---
+errors = tech_eng.fetcher.describe_errors()
+if errors:
+    with st.sidebar.expander(f"⚠️ Falhas de download ({len(errors)})"):
+        for key, err in errors.items():
+            st.caption(f"**{key}**: {err}")
+
+METRICS.observe('rerun', time.perf_counter() - rerun_start)
 
-assets_map = db.assets
-with tabs[0]: render_premium_tab("Fiagros", assets_map['Fiagros (Renda Mensal)'])
-with tabs[1]: render_premium_tab("Ações", assets_map['Ações (Crescimento)'])
-with tabs[2]: render_premium_tab("Global", assets_map['Global (BDRs/ETFs)'])
-with tabs[3]: render_premium_tab("Commodities", assets_map['Commodities'])
+# --- DIAGNÓSTICO ---
+# Onde cada atualização gasta tempo: spans e contadores acumulados no processo
+if show_diagnostics:
+    snap = METRICS.snapshot()
+    label = lambda m: m['name'] + (f" [{', '.join(f'{k}={v}' for k, v in m['labels'].items())}]" if m['labels'] else '')
+    with st.sidebar:
+        st.subheader("🩺 Diagnóstico")
+        st.dataframe(pd.DataFrame([{
+            "Etapa": label(s), "Chamadas": s['count'], "Total (ms)": s['sum'] * 1000,
+            "Média (ms)": s['sum'] / s['count'] * 1000, "Máx (ms)": s['max'] * 1000, "Última (ms)": s['last'] * 1000,
+        } for s in snap['spans']]), hide_index=True, use_container_width=True)
+        st.dataframe(pd.DataFrame([{"Contador": label(c), "Valor": c['value']} for c in snap['counters']]),
+                     hide_index=True, use_container_width=True)
+        d1, d2 = st.columns(2)
+        d1.download_button("JSON", METRICS.to_json(), file_name="agro_metrics.json", mime="application/json")
+        d2.download_button("Prometheus", METRICS.to_prometheus(), file_name="agro_metrics.prom", mime="text/plain")
+        if st.button("Zerar métricas"):
+            METRICS.reset()
+            st.rerun()
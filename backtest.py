@@ -0,0 +1,94 @@
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from agro_analytics import AgroDatabase, TechnicalEngine, UNIVERSE_PATH
+from fetcher import Fetcher
+from panel import build_panel, panel_signals, score_codes, STATUS_LABELS
+
+
+# --- BACKTEST DO SCORE TÉCNICO ---
+# Uso: python backtest.py [--horizons 5,20,60] [--category Commodities] [--output arquivo.csv]
+# Pontua todos os pregões de todo o histórico gravado (operações matriciais sobre
+# o painel, sem o score escalar em laço) e mede o retorno futuro de cada status:
+# média, mediana, taxa de acerto (retorno > 0) e o giro diário de status.
+# Só o técnico: o .info do Yahoo não tem histórico para reconstruir o fundamentalista.
+HORIZONS = (5, 20, 60)
+CHUNK = 500  # Tickers por bloco do painel: limita a memória em universos grandes
+
+
+def _score_chunk(close, horizons):
+    x = close.to_numpy(dtype=float)
+    i = panel_signals(close, bands=False)
+    _, code = score_codes(x, *(i[k].to_numpy() for k in ('SMA20', 'SMA50', 'SMA200', 'RSI', 'MACD', 'MACD_S')))
+    # Só barras com todos os indicadores completos (a SMA200 é a última a ficar pronta)
+    valid = ~np.isnan(i['SMA200'].to_numpy())
+
+    returns = {}
+    for h in horizons:
+        fwd = np.full(x.shape, np.nan)
+        fwd[:-h] = x[h:] / x[:-h] - 1
+        ok = valid & ~np.isnan(fwd)
+        for c in range(len(STATUS_LABELS)):
+            returns[c, h] = fwd[ok & (code == c)].astype(np.float32)
+        returns['all', h] = fwd[ok].astype(np.float32)
+
+    both = valid[1:] & valid[:-1]
+    changes = (code[1:] != code[:-1]) & both
+    days = np.bincount(code[valid], minlength=len(STATUS_LABELS))
+    return returns, int(changes.sum()), int(both.sum()), days
+
+
+def backtest(frames, horizons=HORIZONS, chunk=CHUNK):
+    # frames: {ticker: OHLC com o histórico completo}. Devolve (tabela por status, resumo)
+    tickers = [t for t, df in frames.items() if df is not None and not df.empty]
+    parts, changes, pairs = [], 0, 0
+    days = np.zeros(len(STATUS_LABELS), dtype=np.int64)
+    for start in range(0, len(tickers), chunk):
+        close = build_panel({t: frames[t] for t in tickers[start:start + chunk]})
+        returns, c, p, d = _score_chunk(close, horizons)
+        parts.append(returns)
+        changes, pairs, days = changes + c, pairs + p, days + d
+
+    rows = {}
+    for key, label in list(enumerate(STATUS_LABELS)) + [('all', 'Todos')]:
+        row = {'Dias': int(days.sum() if key == 'all' else days[key])}
+        for h in horizons:
+            r = np.concatenate([p[key, h] for p in parts]) if parts else np.array([], dtype=np.float32)
+            row[f'Ret {h}d %'] = float(r.mean()) * 100 if len(r) else np.nan
+            row[f'Mediana {h}d %'] = float(np.median(r)) * 100 if len(r) else np.nan
+            row[f'Acerto {h}d %'] = float((r > 0).mean()) * 100 if len(r) else np.nan
+        rows[label] = row
+    table = pd.DataFrame.from_dict(rows, orient='index').rename_axis('Status')
+    summary = {'tickers': len(tickers), 'giro_diario': changes / pairs if pairs else 0.0}
+    return table, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest do score técnico do AgroMonitor")
+    parser.add_argument('--horizons', default=','.join(map(str, HORIZONS)), help="pregões à frente, separados por vírgula")
+    parser.add_argument('--category', action='append', help="categoria (repetível); padrão: todas")
+    parser.add_argument('--universe', default=UNIVERSE_PATH, help="arquivo do universo (CSV ou JSON)")
+    parser.add_argument('--output', help="grava a tabela em CSV")
+    args = parser.parse_args()
+
+    db = AgroDatabase(args.universe)
+    tech = TechnicalEngine(fetcher=Fetcher())
+    tickers = [t for c in (args.category or list(db.assets)) for t in db.get_tickers(c)]
+    # Garante o histórico em disco (download incremental) e lê tudo, não só a janela de 2 anos
+    tech.prefetch(tickers)
+    frames = {t: tech.store.load(t) for t in tickers}
+
+    start = time.perf_counter()
+    table, summary = backtest(frames, tuple(int(h) for h in args.horizons.split(',')))
+    elapsed = time.perf_counter() - start
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:.2f}'.format):
+        print(table)
+    print(f"\n{summary['tickers']} ativos, giro diário de status {summary['giro_diario'] * 100:.1f}%, "
+          f"backtest em {elapsed:.2f}s", file=sys.stderr)
+    if args.output: table.to_csv(args.output)
+
+
+if __name__ == '__main__':
+    main()
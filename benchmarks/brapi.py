@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+import providers
+from agro_analytics import AgroDatabase, TechnicalEngine, FundamentalEngine
+from fetcher import Fetcher
+from dividend_store import DividendStore
+from price_store import PriceStore
+from providers import BrapiProvider, YahooProvider, BRAPI_RANGES
+from benchmarks.fakes import FakeYF, Fixtures, synthetic_universe
+
+
+# --- BRAPI LOCAL E COMPARAÇÃO DE PROVEDORES ---
+# Uso: python -m benchmarks.brapi [--size 200] [--latency 0.05]
+# Sobe um servidor HTTP local que responde /api/quote como o brapi, com os dados
+# das fixtures, e roda o mesmo pipeline (cotações + fundamentos dos ativos .SA)
+# pelo Yahoo falso e pelo BrapiProvider. Mostra requisições, conexões e tempo, e
+# falha (código 1) se os dois provedores discordarem em fechamentos ou múltiplos.
+RANGE_DAYS = {r: limit for limit, r in BRAPI_RANGES}
+
+
+class StandInBrapi:
+    def __init__(self, fixtures, latency=0.0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _count(self, attr):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def quote(self, symbol, range_):
+        ticker = f"{symbol}.SA"
+        df = self.fixtures.ohlcv(ticker)
+        if range_ in RANGE_DAYS: df = df[df.index > df.index[-1] - pd.Timedelta(days=RANGE_DAYS[range_])]
+        # Meia-noite de São Paulo em epoch, como o brapi
+        dates = (df.index.tz_localize('America/Sao_Paulo') - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+        info = self.fixtures.info(ticker)
+        divs = self.fixtures.dividends(ticker)
+        return {
+            'symbol': symbol, 'longName': symbol, 'currency': 'BRL',
+            'priceEarnings': info.get('trailingPE'),
+            'defaultKeyStatistics': {'priceToBook': info.get('priceToBook')},
+            'financialData': {'returnOnEquity': info.get('returnOnEquity')},
+            'historicalDataPrice': [
+                {'date': int(d), 'open': o, 'high': h, 'low': lo, 'close': c, 'volume': v, 'adjustedClose': c}
+                for d, o, h, lo, c, v in zip(dates, df['Open'], df['High'], df['Low'], df['Close'], df['Volume'])],
+            'dividendsData': {'cashDividends': [
+                {'lastDatePrior': ts.tz_convert('UTC').isoformat(), 'rate': float(r)} for ts, r in divs.items()]},
+        }
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive: várias requisições por conexão
+
+            def setup(self):
+                super().setup()
+                stand_in._count('connections')
+
+            def do_GET(self):
+                stand_in._count('requests')
+                if stand_in.latency: time.sleep(stand_in.latency)
+                url = urlparse(self.path)
+                if not url.path.startswith('/api/quote/'):
+                    self.send_error(404)
+                    return
+                range_ = parse_qs(url.query).get('range', ['2y'])[0]
+                symbols = url.path.rsplit('/', 1)[1].split(',')
+                body = json.dumps({'results': [stand_in.quote(s, range_) for s in symbols]}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def run_pipeline(provider, tickers):
+    root = tempfile.mkdtemp(prefix='agro-brapi-')
+    try:
+        fetcher = Fetcher(rate=1e9, burst=1e9, backoff=0)
+        tech = TechnicalEngine(store=PriceStore(root), fetcher=fetcher, provider=provider,
+                               dividend_store=DividendStore(os.path.join(root, 'dividends')))
+        fund = FundamentalEngine(fetcher=fetcher, tech_engine=tech)
+        start = time.perf_counter()
+        tech.prefetch(tickers)
+        fund.prefetch({t: 'Ações (Crescimento)' for t in tickers})
+        elapsed = time.perf_counter() - start
+        closes = {t: float(df['Close'].iloc[-1]) for t in tickers if (df := tech.get_data(t)) is not None}
+        # DY calculado dos proventos nos dois: com Yahoo, get_fundamentals prefere o dividendYield do .info
+        fundamentals = {t: dict(fund.get_fundamentals(t, 'Ações (Crescimento)'), DY=fund.calculate_dy_manual(t))
+                        for t in tickers}
+        return elapsed, closes, fundamentals, fetcher.describe_errors()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Yahoo x brapi contra um brapi local")
+    parser.add_argument('--size', type=int, default=0, help="ativos .SA sintéticos somados aos reais")
+    parser.add_argument('--latency', type=float, default=0.05, help="segundos por requisição, nos dois provedores")
+    args = parser.parse_args()
+
+    fixtures = Fixtures()
+    tickers = [t for t in AgroDatabase().get_tickers() if t.endswith('.SA')] + synthetic_universe(args.size)
+
+    fake = FakeYF(fixtures, latency=args.latency)
+    providers.yf = fake
+    yahoo = run_pipeline(YahooProvider(), tickers)
+    yahoo_requests = fake.symbols + fake.calls.get('info', 0) + fake.calls.get('dividends', 0) + fake.calls.get('history', 0)
+
+    with StandInBrapi(fixtures, latency=args.latency) as server:
+        brapi = run_pipeline(BrapiProvider('local', base_url=server.url), tickers)
+        brapi_requests, connections = server.requests, server.connections
+
+    print(f"{len(tickers)} ativos .SA")
+    print(f"{'provedor':<10}{'requisições':>13}{'conexões':>10}{'tempo (s)':>11}")
+    print(f"{'yahoo':<10}{yahoo_requests:>13}{'-':>10}{yahoo[0]:>11.2f}")
+    print(f"{'brapi':<10}{brapi_requests:>13}{connections:>10}{brapi[0]:>11.2f}")
+
+    failures = [f"{p}: {k}: {e}" for p, r in (('yahoo', yahoo), ('brapi', brapi)) for k, e in r[3].items()]
+    for t in tickers:
+        a, b = yahoo[1].get(t), brapi[1].get(t)
+        if a is None or b is None or not np.isclose(a, b, rtol=1e-5): failures.append(f"{t}: fechamento {a} x {b}")
+        fa, fb = yahoo[2][t], brapi[2][t]
+        for key in ('P/L', 'P/VP', 'ROE', 'DY'):
+            if not np.isclose(fa[key] or 0, fb[key] or 0, rtol=1e-5, atol=1e-9):
+                failures.append(f"{t}: {key} {fa[key]} x {fb[key]}")
+    if failures:
+        print("\nDIVERGÊNCIAS:")
+        for line in failures[:20]: print(f"  {line}")
+        sys.exit(1)
+    print("\nprovedores concordam em fechamentos e múltiplos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import json
+import os
+import re
+import time
+import threading
+import numpy as np
+import pandas as pd
+from price_store import PriceStore
+
+
+# --- FIXTURES E PROVEDOR FALSO ---
+# Cotações, proventos e .info gravados do Yahoo (python -m benchmarks.record)
+# ficam em benchmarks/fixtures. Sem gravação, ou para universos maiores que o
+# gravado, as séries são sintetizadas de forma determinística (semente por ticker).
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+END_DATE = pd.Timestamp('2026-10-15')
+BARS = 520
+
+
+def _seed(ticker):
+    return sum((i + 1) * ord(c) for i, c in enumerate(ticker))
+
+
+def synthetic_ohlcv(ticker, bars=BARS, end=END_DATE):
+    rng = np.random.default_rng(_seed(ticker))
+    close = 10 + 90 * rng.random()
+    close = close * np.exp(np.cumsum(rng.normal(0.0002, 0.015, bars)))
+    spread = np.abs(rng.normal(0, 0.008, bars))
+    idx = pd.bdate_range(end=end, periods=bars, name='Date')
+    return pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.004, bars)),
+        'High': close * (1 + spread), 'Low': close * (1 - spread), 'Close': close,
+        'Volume': rng.integers(1_000, 1_000_000, bars).astype(float),
+    }, index=idx)
+
+
+def synthetic_dividends(ticker, end=END_DATE):
+    # Fiagros (xxxx11.SA) pagam todo mês; o resto paga trimestralmente, ou nada
+    rng = np.random.default_rng(_seed(ticker) + 1)
+    if ticker.endswith('11.SA'): freq, value = 'MS', 0.08 + 0.06 * rng.random()
+    elif rng.random() < 0.6: freq, value = 'QS', 0.1 + 0.5 * rng.random()
+    else: return pd.Series(dtype=float, name='Dividends', index=pd.DatetimeIndex([], tz='America/Sao_Paulo'))
+    idx = pd.date_range(end=end, periods=36 if freq == 'MS' else 12, freq=freq, tz='America/Sao_Paulo')
+    return pd.Series(value * (1 + rng.normal(0, 0.05, len(idx))), index=idx, name='Dividends')
+
+
+def synthetic_info(ticker):
+    rng = np.random.default_rng(_seed(ticker) + 2)
+    if rng.random() < 0.1: return {}  # Parte do universo sem .info, como no Yahoo
+    return {
+        'trailingPE': float(rng.uniform(3, 30)), 'priceToBook': float(rng.uniform(0.6, 3)),
+        'returnOnEquity': float(rng.uniform(-0.05, 0.3)),
+        'dividendYield': float(rng.uniform(0.02, 0.14)) if rng.random() < 0.5 else None,
+    }
+
+
+def synthetic_universe(n):
+    # Tickers fictícios no formato B3, para escalar além do universo real
+    return [f"SY{i:04d}{'11' if i % 4 == 0 else '3'}.SA" for i in range(n)]
+
+
+class Fixtures:
+    # Dados de um universo: gravados quando existem, sintéticos quando não
+    def __init__(self, root=FIXTURE_DIR):
+        self.root = root
+        self.ohlcv_store = PriceStore(os.path.join(root, 'ohlcv'))
+        self._cache = {}
+
+    def _path(self, kind, ticker, ext):
+        return os.path.join(self.root, kind, re.sub(r'[^A-Za-z0-9._-]', '_', ticker) + ext)
+
+    def ohlcv(self, ticker):
+        if ('ohlcv', ticker) not in self._cache:
+            df = self.ohlcv_store.load(ticker)
+            self._cache['ohlcv', ticker] = df if df is not None else synthetic_ohlcv(ticker)
+        return self._cache['ohlcv', ticker]
+
+    def dividends(self, ticker):
+        path = self._path('dividends', ticker, '.csv')
+        if os.path.exists(path):
+            s = pd.read_csv(path, index_col=0, parse_dates=True)['Dividends']
+            s.index = pd.DatetimeIndex(s.index, tz='UTC').tz_convert('America/Sao_Paulo')
+            return s
+        return synthetic_dividends(ticker)
+
+    def info(self, ticker):
+        path = self._path('info', ticker, '.json')
+        if os.path.exists(path):
+            with open(path) as f: return json.load(f)
+        return synthetic_info(ticker)
+
+    def record(self, yf, tickers):
+        # Grava do Yahoo de verdade: python -m benchmarks.record
+        for kind in ('dividends', 'info'): os.makedirs(os.path.join(self.root, kind), exist_ok=True)
+        for ticker in tickers:
+            df = yf.download(ticker, period='2y', progress=False, auto_adjust=True)
+            if df.empty: continue
+            if isinstance(df.columns, pd.MultiIndex): df.columns = df.columns.get_level_values(0)
+            self.ohlcv_store.save(ticker, df)
+            stock = yf.Ticker(ticker)
+            divs = stock.dividends
+            divs.index = divs.index.tz_convert('UTC').tz_localize(None)
+            divs.rename('Dividends').to_csv(self._path('dividends', ticker, '.csv'))
+            info = {k: v for k, v in (stock.info or {}).items() if isinstance(v, (int, float, str, type(None)))}
+            with open(self._path('info', ticker, '.json'), 'w') as f: json.dump(info, f)
+
+
+class FakeTicker:
+    def __init__(self, provider, ticker):
+        self._provider = provider
+        self.ticker = ticker
+
+    @property
+    def dividends(self):
+        self._provider._hit('dividends')
+        return self._provider.fixtures.dividends(self.ticker).copy()
+
+    @property
+    def info(self):
+        self._provider._hit('info')
+        return dict(self._provider.fixtures.info(self.ticker))
+
+    def history(self, period='5d', **kwargs):
+        self._provider._hit('history')
+        return self._provider.fixtures.ohlcv(self.ticker).tail(5).copy()
+
+
+class FakeYF:
+    # Substituto do módulo yfinance: providers.yf = FakeYF(...).
+    # 'latency' simula o tempo de rede por chamada; 'calls' conta as chamadas e
+    # 'symbols' os tickers pedidos ao download (o yfinance faz uma requisição HTTP
+    # por ticker, mesmo num download em lote).
+    def __init__(self, fixtures=None, latency=0.0):
+        self.fixtures = fixtures or Fixtures()
+        self.latency = latency
+        self.calls = {}
+        self.symbols = 0
+        self._lock = threading.Lock()
+
+    def _hit(self, kind):
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+        if self.latency: time.sleep(self.latency)
+
+    def download(self, tickers, period=None, start=None, group_by=None, actions=False, **kwargs):
+        self._hit('download')
+        single = isinstance(tickers, str)
+        with self._lock:
+            self.symbols += 1 if single else len(tickers)
+        frames = {}
+        for ticker in [tickers] if single else tickers:
+            df = self.fixtures.ohlcv(ticker)
+            if actions:
+                # Como o yfinance: provento na barra da data-com, 0 nos outros dias
+                divs = self.fixtures.dividends(ticker)
+                divs.index = divs.index.tz_localize(None).normalize()
+                df = df.assign(Dividends=divs.groupby(level=0).sum().reindex(df.index, fill_value=0.0),
+                               **{'Stock Splits': 0.0})
+            if start is not None: df = df[df.index >= pd.Timestamp(start)]
+            frames[ticker] = df
+        if not frames: return pd.DataFrame()
+        out = pd.concat(frames, axis=1)
+        if single or group_by != 'ticker': out = out.swaplevel(axis=1)  # (campo, ticker), como o yfinance
+        return out
+
+    def Ticker(self, ticker):
+        return FakeTicker(self, ticker)
+
+    def total_calls(self):
+        return sum(self.calls.values())
@@ -0,0 +1,57 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+
+# --- TEMPO DE IMPORTAÇÃO DOS MOTORES ---
+# Uso: python -m benchmarks.imports [--module agro_analytics] [--budget 1.0] [--top 10]
+# Importa o módulo num processo novo com 'python -X importtime', mostra os
+# módulos mais caros e falha (código 1) se o total passar do orçamento ou se
+# algum módulo proibido (Streamlit, yfinance, ta) for carregado no import.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORBIDDEN = ('streamlit', 'yfinance', 'ta', 'plotly')
+
+
+def measure(module):
+    # Melhor de 3: a primeira rodada paga o cache de disco dos .pyc
+    best = None
+    for _ in range(3):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                              cwd=ROOT, capture_output=True, text=True, check=True)
+        rows = []
+        for line in proc.stderr.splitlines():
+            m = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)', line)
+            if m: rows.append((m.group(4), int(m.group(2)) / 1e6, len(m.group(3))))
+        total = next(sec for name, sec, depth in rows if name == module and depth == 1)
+        if best is None or total < best[0]: best = (total, rows)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação dos motores")
+    parser.add_argument('--module', default='agro_analytics')
+    parser.add_argument('--budget', type=float, default=1.0, help="segundos")
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    total, rows = measure(args.module)
+    # Só os módulos carregados diretamente pelo alvo: o importtime lista a
+    # subárvore logo antes da linha do próprio módulo
+    end = next(i for i, r in enumerate(rows) if r[0] == args.module and r[2] == 1)
+    begin = max([i + 1 for i, r in enumerate(rows[:end]) if r[2] == 1], default=0)
+    direct = sorted((r for r in rows[begin:end] if r[2] == 3), key=lambda r: -r[1])
+    for name, sec, _ in direct[:args.top]: print(f"{name:<30}{sec * 1000:>10.1f} ms")
+    print(f"{args.module:<30}{total * 1000:>10.1f} ms (orçamento {args.budget * 1000:.0f} ms)")
+
+    loaded = {name.split('.')[0] for name, _, _ in rows}
+    failures = [f"{m} importado" for m in FORBIDDEN if m in loaded]
+    if total > args.budget: failures.append(f"{total * 1000:.0f} ms > orçamento")
+    if failures:
+        print("FALHOU: " + '; '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+import argparse
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import agro_analytics
+import providers
+from benchmarks.fakes import FakeYF
+
+
+# --- TESTE DE CARGA DO APP (SESSÕES CONCORRENTES) ---
+# Uso: python -m benchmarks.load [--sessions 8] [--actions 10] [--latency 0.05] [--snapshot] [--p95-budget 5]
+# Roda o app.py de verdade, sem navegador, pelo AppTest do Streamlit: cada
+# sessão é uma thread com o seu AppTest, todas no mesmo processo, como num
+# servidor Streamlit (o st.cache_resource é compartilhado entre as sessões).
+# O yfinance é trocado pelo FakeYF com latência por chamada. Mede a latência de
+# cada rerun (p50/p95/p99, por ação), o tempo de CPU e o pico de RSS do
+# processo e as chamadas ao provedor; falha (código 1) se o p95 passar do orçamento.
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+SEARCHES = ['SLC', 'AGRO', 'RURA', 'KNCA', 'DE', 'ZZZZ']
+
+
+def app_test(timeout):
+    # Importado aqui: o resto dos benchmarks roda sem Streamlit instalado
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+
+def configure_streamlit():
+    # global.appTest valendo para o processo todo: o AppTest só o liga durante
+    # cada run (e desfaz no fim), e com sessões simultâneas o fim de uma
+    # desligaria o registro dos widgets de outra no meio do script.
+    # Avisos de depreciação do Streamlit, um por elemento por rerun, afogam o
+    # relatório. Nível no config, que o AppTest reaplica a cada run, e nos
+    # loggers já criados (o import do AppTest cria os dos elementos).
+    import streamlit.testing.v1
+    from streamlit import config
+    from streamlit.logger import set_log_level
+    config.set_option('global.appTest', True)
+    config.set_option('logger.level', 'error')
+    set_log_level('error')
+
+
+def share_runtime():
+    # O AppTest instala um Runtime falso global a cada run e o zera no fim: com
+    # sessões simultâneas, o fim de uma tiraria o Runtime das outras no meio do
+    # script. Enquanto houver sessões, vale o último Runtime instalado.
+    from streamlit.runtime import Runtime
+    last = []
+
+    def instance(cls):
+        if cls._instance is not None: last[:] = [cls._instance]
+        if not last: raise RuntimeError("Runtime hasn't been created!")
+        return last[0]
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or bool(last))
+
+
+def share_secrets():
+    # O app lê o st.secrets: sem secrets.toml, os mesmos valores do ambiente.
+    # Um único Secrets global, e não o at.secrets de cada sessão: o AppTest troca
+    # o st.secrets a cada run e devolve o anterior no fim, o que tiraria os
+    # segredos de outra sessão no meio do script.
+    import streamlit as st
+    from streamlit.runtime.secrets import Secrets
+    secrets = Secrets()
+    secrets._secrets = {'BRAPI_TOKEN': agro_analytics.BRAPI_TOKEN, 'DATA_PROVIDER': agro_analytics.DATA_PROVIDER}
+    st.secrets = secrets
+
+
+def share_bytecode():
+    # O AppTest cria um ScriptCache por run e recompila o app.py a cada rerun;
+    # num servidor o script é compilado uma vez. Além do custo que não existe em
+    # produção, compilações simultâneas esbarram no ast.parse do CPython 3.11
+    # (SystemError de profundidade do AST) e a página sai vazia.
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    compile_script, compiled, lock = ScriptCache.get_bytecode, {}, threading.Lock()
+
+    def get_bytecode(self, script_path):
+        with lock:
+            if script_path not in compiled: compiled[script_path] = compile_script(self, script_path)
+            return compiled[script_path]
+    ScriptCache.get_bytecode = get_bytecode
+
+
+# Ações de um analista na página. Cada uma termina num rerun completo do script.
+ACTIONS = {
+    'rerun': lambda at, rng: at.run(),
+    'slider': lambda at, rng: at.slider[0].set_value(rng.choice([0, 30, 50, 70])).run(),
+    'busca': lambda at, rng: at.text_input[0].input(rng.choice(SEARCHES)).run(),
+    'limpa busca': lambda at, rng: at.text_input[0].input('').run(),
+}
+
+
+class Session(threading.Thread):
+    def __init__(self, index, args, start_barrier):
+        super().__init__(name=f"sessao-{index}", daemon=True)
+        self.rng = random.Random(args.seed + index)
+        self.args = args
+        self.start_barrier = start_barrier
+        self.timings = []  # (ação, segundos)
+        self.errors = []
+
+    def step(self, name, run):
+        start = time.perf_counter()
+        try:
+            at = run()
+        except Exception as exc:
+            self.errors.append(f"{name}: {type(exc).__name__}: {exc}")
+            return None
+        self.timings.append((name, time.perf_counter() - start))
+        # Exceção no script aparece na árvore da página, não no run(); a sessão para aí
+        if at.exception:
+            self.errors.extend(f"{name}: {e.value}" for e in at.exception)
+            return None
+        return at
+
+    def run(self):
+        at = app_test(self.args.timeout)
+        self.start_barrier.wait()
+        # Primeira visita: todas as sessões abrem a página ao mesmo tempo
+        if self.step('abertura', at.run) is None: return
+        for _ in range(self.args.actions):
+            if self.args.think: time.sleep(self.rng.uniform(0, self.args.think))
+            name = self.rng.choice(list(ACTIONS))
+            if self.step(name, lambda: ACTIONS[name](at, self.rng)) is None: return
+
+
+def percentiles(values):
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return p50, p95, p99
+
+
+def prepare(root, args):
+    # Armazéns e snapshot num diretório temporário: a carga começa sempre do zero
+    agro_analytics.DATA_DIR = root
+    agro_analytics.SNAPSHOT_PATH = os.path.join(root, 'snapshot.pkl')
+    if not args.snapshot: return
+    # Modo worker: a página só lê o snapshot, como em produção com o worker.py
+    from agro_analytics import AgroDatabase, TechnicalEngine, FundamentalEngine
+    from fetcher import Fetcher
+    from pipeline import build_snapshot
+    from snapshot import write_snapshot
+    fetcher = Fetcher(rate=1e9, burst=1e9, backoff=0)
+    db, tech = AgroDatabase(), TechnicalEngine(fetcher=fetcher)
+    try:
+        write_snapshot(build_snapshot(db, tech, FundamentalEngine(fetcher=fetcher, tech_engine=tech)),
+                       agro_analytics.SNAPSHOT_PATH)
+    finally:
+        tech.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do app.py com sessões concorrentes")
+    parser.add_argument('--sessions', type=int, default=8, help="sessões simultâneas")
+    parser.add_argument('--actions', type=int, default=10, help="ações por sessão, depois da abertura")
+    parser.add_argument('--latency', type=float, default=0.05, help="latência por chamada ao provedor (s)")
+    parser.add_argument('--think', type=float, default=0.0, help="pausa máxima entre ações (s)")
+    parser.add_argument('--snapshot', action='store_true', help="lê um snapshot do worker em vez de calcular")
+    parser.add_argument('--timeout', type=float, default=300, help="tempo máximo de um rerun (s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--p95-budget', type=float, default=None, help="falha se o p95 dos reruns passar disto (s)")
+    args = parser.parse_args()
+    configure_streamlit()
+    share_runtime()
+    share_secrets()
+    share_bytecode()
+
+    root = tempfile.mkdtemp(prefix='agro-load-')
+    fake = FakeYF(latency=args.latency)
+    providers.yf = fake
+    try:
+        prepare(root, args)
+        # Só a carga conta: o snapshot do modo worker é feito antes
+        fake.calls.clear()
+        fake.symbols = 0
+        barrier = threading.Barrier(args.sessions)
+        sessions = [Session(i, args, barrier) for i in range(args.sessions)]
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        for s in sessions: s.start()
+        for s in sessions: s.join()
+        cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    timings = [t for s in sessions for t in s.timings]
+    errors = [e for s in sessions for e in s.errors]
+    if not timings:
+        print("nenhum rerun concluído")
+        for e in errors[:10]: print(f"  {e}")
+        sys.exit(1)
+
+    print(f"{args.sessions} sessões x {args.actions + 1} reruns, latência do provedor {args.latency * 1000:.0f} ms, "
+          f"modo {'snapshot' if args.snapshot else 'ao vivo'}\n")
+    print(f"{'ação':<14}{'n':>6}{'p50 (ms)':>11}{'p95 (ms)':>11}{'p99 (ms)':>11}{'máx (ms)':>11}")
+    groups = {'abertura': [], **{name: [] for name in ACTIONS}}
+    for name, sec in timings: groups[name].append(sec)
+    groups['todas'] = [sec for _, sec in timings]
+    for name, values in groups.items():
+        if not values: continue
+        p50, p95, p99 = percentiles(values)
+        print(f"{name:<14}{len(values):>6}{p50 * 1000:>11.0f}{p95 * 1000:>11.0f}{p99 * 1000:>11.0f}{max(values) * 1000:>11.0f}")
+
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+    print(f"\nparede {wall:.1f} s, CPU {cpu:.1f} s ({cpu / len(timings) * 1000:.0f} ms por rerun), pico de RSS {peak_rss:.0f} MB")
+    calls = ', '.join(f"{k}={v}" for k, v in sorted(fake.calls.items())) or 'nenhuma'
+    print(f"chamadas ao provedor: {calls}; tickers baixados: {fake.symbols}")
+
+    failures = [f"{len(errors)} erros nas sessões"] if errors else []
+    for e in errors[:10]: print(f"  erro: {e}")
+    p95 = percentiles(groups['todas'])[1]
+    if args.p95_budget is not None and p95 > args.p95_budget:
+        failures.append(f"p95 {p95:.2f} s > orçamento {args.p95_budget:.2f} s")
+    if failures:
+        print("\nFALHAS:")
+        for line in failures: print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+import yfinance as yf
+from agro_analytics import AgroDatabase
+from benchmarks.fakes import Fixtures
+
+
+# --- GRAVAÇÃO DAS FIXTURES ---
+# Uso: python -m benchmarks.record  (precisa de acesso ao Yahoo)
+# Grava cotações, proventos e .info do universo real em benchmarks/fixtures.
+if __name__ == '__main__':
+    tickers = AgroDatabase().get_tickers()
+    Fixtures().record(yf, tickers)
+    print(f"{len(tickers)} tickers gravados")
@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import agro_analytics
+import providers
+from agro_analytics import AgroDatabase, TechnicalEngine, FundamentalEngine
+from fetcher import Fetcher
+from dividend_store import DividendStore
+from price_store import PriceStore
+from providers import YahooProvider
+from benchmarks.fakes import FakeYF, synthetic_universe
+
+
+# --- MICRO-BENCHMARKS DOS MOTORES (OFFLINE) ---
+# Uso: python -m benchmarks.run [--sizes 42,500,2000] [--save-baseline] [--threshold 0.3]
+# Roda contra o FakeYF (fixtures gravadas ou sintéticas), mede vazão e pico de
+# memória de cada caminho quente e falha (código 1) se algum regredir mais que
+# 'threshold' em relação ao baseline salvo. Os tempos são comparados em unidades
+# de um laço de calibração medido na mesma rodada: o baseline gravado numa
+# máquina vale em outra mais lenta ou mais rápida.
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+MIN_TIMED = 0.005  # Abaixo disso (s) a vazão não entra na comparação
+MIN_TOTAL = 1.0    # Casos curtos repetem até somar isso (s) cronometrado...
+MAX_ROUNDS = 30    # ...sem passar deste número de rodadas
+MAX_WALL = 30.0    # ...nem deste tempo (s) com o preparo: nos universos grandes ele domina
+
+
+def build_universe(db, size):
+    real = db.get_tickers()
+    tickers = real[:size] + synthetic_universe(max(0, size - len(real)))
+    categories = {}
+    for t in tickers:
+        name, cat = db.get_info(t)
+        if cat == "Outros": cat = 'Fiagros (Renda Mensal)' if t.endswith('11.SA') else 'Ações (Crescimento)'
+        categories[t] = cat
+    return tickers, categories
+
+
+class Context:
+    # Motores novos sobre um armazém temporário: cada medição 'fria' começa do zero
+    def __init__(self, tickers, categories):
+        self.tickers = tickers
+        self.categories = categories
+        self.root = tempfile.mkdtemp(prefix='agro-bench-')
+        # Sem rate limit nem backoff: mede o código, não o ritmo imposto ao Yahoo
+        fetcher = Fetcher(rate=1e9, burst=1e9, backoff=0)
+        self.tech = TechnicalEngine(store=PriceStore(self.root), fetcher=fetcher, provider=YahooProvider(),
+                                    dividend_store=DividendStore(os.path.join(self.root, 'dividends')))
+        self.fund = FundamentalEngine(fetcher=fetcher, tech_engine=self.tech)
+
+    def close(self):
+        self.tech.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def warm(ctx):
+    ctx.tech.prefetch(ctx.tickers)
+    ctx.frames = {t: ctx.tech.get_data(t) for t in ctx.tickers}
+    ctx.signals = {t: ctx.tech.calculate_signals(df) for t, df in ctx.frames.items()}
+    ctx.fundamentals = {t: ctx.fund.get_fundamentals(t, c) for t, c in ctx.categories.items()}
+    return ctx
+
+
+def parallel(ctx):
+    # Um processo por núcleo, pool já aberto: mede o score, não o spawn
+    warm(ctx)
+    ctx.tech.memo.clear()
+    ctx.tech.processes = os.cpu_count()
+    ctx.tech._process_pool().submit(int).result()
+    return ctx
+
+
+# Cada benchmark: (nome, preparo, execução). O preparo fica fora do cronômetro.
+# Abaixo de PARALLEL_MIN o score_universe não abre processos: o caso dos
+# processos repetiria o do painel e só roda a partir dele.
+MIN_SIZE = {'score_universe (processos)': agro_analytics.PARALLEL_MIN}
+BENCHMARKS = [
+    ('get_data (frio)', lambda ctx: ctx,
+     lambda ctx: [ctx.tech.get_data(t) for t in ctx.tickers]),
+    ('get_data (cache)', warm,
+     lambda ctx: [ctx.tech.get_data(t) for t in ctx.tickers]),
+    ('prefetch (lote, frio)', lambda ctx: ctx,
+     lambda ctx: ctx.tech.prefetch(ctx.tickers)),
+    ('calculate_signals', warm,
+     lambda ctx: [ctx.tech.calculate_signals(df) for df in ctx.frames.values()]),
+    ('generate_tech_score', warm,
+     lambda ctx: [ctx.tech.generate_tech_score(ctx.frames[t], i) for t, i in ctx.signals.items()]),
+    ('score_universe (painel)', lambda ctx: (warm(ctx), ctx.tech.memo.clear())[0],
+     lambda ctx: ctx.tech.score_universe(ctx.tickers)),
+    ('score_universe (processos)', parallel,
+     lambda ctx: ctx.tech.score_universe(ctx.tickers)),
+    ('get_fundamentals (frio)', lambda ctx: (ctx.tech.prefetch(ctx.tickers), ctx)[1],
+     lambda ctx: [ctx.fund.get_fundamentals(t, c) for t, c in ctx.categories.items()]),
+    ('generate_fund_score', warm,
+     lambda ctx: [ctx.fund.generate_fund_score(ctx.fundamentals[t], c) for t, c in ctx.categories.items()]),
+]
+
+
+def calibrate(rounds=15):
+    # Trabalho fixo com a mesma mistura dos benchmarks (laço Python, numpy e
+    # pandas); vale o melhor tempo
+    x = np.random.default_rng(0).standard_normal(100_000)
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        total = 0.0
+        for v in x[:20_000].tolist(): total += v * v
+        np.sort(x)
+        pd.Series(x).rolling(20).mean().iloc[-1]
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(setup, run, tickers, categories, repeat):
+    # Melhor de pelo menos 'repeat' rodadas; os casos de poucas dezenas de ms
+    # repetem até MIN_TOTAL, senão o agendamento decide o resultado
+    best, total, rounds, wall = float('inf'), 0.0, 0, time.perf_counter()
+    while rounds < repeat or (total < MIN_TOTAL and rounds < MAX_ROUNDS and time.perf_counter() - wall < MAX_WALL):
+        rounds += 1
+        ctx = setup(Context(tickers, categories))
+        try:
+            start = time.perf_counter()
+            run(ctx)
+            elapsed = time.perf_counter() - start
+        finally:
+            ctx.close()
+        best, total = min(best, elapsed), total + elapsed
+
+    # Pico de memória numa rodada à parte: o tracemalloc distorce o tempo
+    ctx = setup(Context(tickers, categories))
+    try:
+        tracemalloc.start()
+        run(ctx)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        ctx.close()
+    return best, peak
+
+
+def compare(results, calibration, baseline, threshold):
+    # Vazão do baseline convertida para a velocidade desta máquina
+    speed = baseline['calibration'] / calibration
+    failures = []
+    for key, r in results.items():
+        base = baseline['results'].get(key)
+        if not base: continue
+        # Medições de poucos milissegundos são ruído de agendamento: só a memória conta
+        timed = base['seconds'] >= MIN_TIMED
+        expected = base['ops_per_sec'] * speed
+        if timed and r['ops_per_sec'] < expected * (1 - threshold):
+            failures.append(f"{key}: vazão {r['ops_per_sec']:.0f}/s < baseline {expected:.0f}/s")
+        if r['peak_mb'] > base['peak_mb'] * (1 + threshold) + 1:
+            failures.append(f"{key}: memória {r['peak_mb']:.1f} MB > baseline {base['peak_mb']:.1f} MB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline do AgroMonitor")
+    parser.add_argument('--sizes', default='42,500,2000', help="tamanhos de universo, separados por vírgula")
+    parser.add_argument('--repeat', type=int, default=3, help="rodadas mínimas por medição (vale a melhor)")
+    parser.add_argument('--only', default='', help="roda só benchmarks cujo nome contém este texto")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="grava os resultados como novo baseline")
+    parser.add_argument('--threshold', type=float, default=0.3, help="regressão tolerada (0.3 = 30%%)")
+    args = parser.parse_args()
+
+    fake = FakeYF()
+    providers.yf = fake
+    db = AgroDatabase()
+
+    calibration = calibrate()
+    print(f"calibração: {calibration * 1000:.1f} ms\n")
+    results = {}
+    print(f"{'benchmark':<28}{'n':>6}{'tempo (ms)':>12}{'ops/s':>12}{'pico (MB)':>11}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        tickers, categories = build_universe(db, size)
+        for name, setup, run in BENCHMARKS:
+            if args.only and args.only not in name: continue
+            if size < MIN_SIZE.get(name, 0): continue
+            best, peak = measure(setup, run, tickers, categories, args.repeat)
+            key = f"{name}@{size}"
+            results[key] = {'seconds': best, 'ops_per_sec': len(tickers) / best, 'peak_mb': peak / 2 ** 20}
+            r = results[key]
+            print(f"{name:<28}{len(tickers):>6}{best * 1000:>12.1f}{r['ops_per_sec']:>12.0f}{r['peak_mb']:>11.1f}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'calibration': calibration, 'results': results}, f, indent=2, sort_keys=True)
+        print(f"baseline gravado em {args.baseline}")
+        return
+
+    # Sem baseline o portão não compara nada: isso é falha, não sucesso silencioso
+    if not os.path.exists(args.baseline):
+        print(f"\nSEM BASELINE em {args.baseline}: nada foi comparado. Grave um com --save-baseline.")
+        sys.exit(1)
+    with open(args.baseline) as f: baseline = json.load(f)
+    missing = sorted(k for k in results if k not in baseline['results'])
+    if missing: print(f"\naviso: sem baseline para {', '.join(missing)}")
+    if len(missing) == len(results):
+        print("nenhum resultado comparável com o baseline")
+        sys.exit(1)
+    failures = compare(results, calibration, baseline, args.threshold)
+    if failures:
+        print("\nREGRESSÕES:")
+        for line in failures: print(f"  {line}")
+        sys.exit(1)
+    print("\nsem regressões em relação ao baseline")
+
+
+if __name__ == '__main__':
+    main()
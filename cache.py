@@ -0,0 +1,100 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+# --- CACHE EM MEMÓRIA COM TTL ---
+# Substitui o st.cache_data nos motores: permite preencher o cache em lote
+# (download multi-ticker) e invalidar entradas individualmente.
+# Entradas vencidas continuam guardadas até serem substituídas ou invalidadas:
+# get(key, allow_stale=True) as devolve para o stale-while-revalidate.
+# É também a interface esperada de um backend alternativo (cache_factory dos
+# motores): get, set, is_stale, stored_at, invalidate, clear, 'in' e version.
+class TTLCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.version = 0  # Muda a cada escrita: serve de chave para resultados derivados
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, allow_stale=False):
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None: return None
+        stored_at, value = entry
+        if not allow_stale and time.time() - stored_at > self.ttl: return None
+        return value
+
+    def stored_at(self, key):
+        # Momento da última gravação da chave (None se ausente)
+        with self._lock:
+            entry = self._data.get(key)
+        return entry[0] if entry else None
+
+    def is_stale(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+        return entry is not None and time.time() - entry[0] > self.ttl
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self.version += 1
+
+    def swap(self, key, expected, value):
+        # Troca o valor só se a entrada ainda for 'expected' (o mesmo objeto),
+        # mantendo o momento da gravação: o TTL segue contando de quando a
+        # entrada foi baixada de fato. Devolve False se alguém gravou antes.
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] is not expected: return False
+            self._data[key] = (entry[0], value)
+            self.version += 1
+            return True
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None: self.version += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.version += 1
+
+
+# --- MEMOIZAÇÃO COM DESCARTE LRU ---
+# Guarda resultados derivados (indicadores, scores); quando enche, descarta
+# o que foi usado há mais tempo.
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None: self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def discard(self, match):
+        # Remove as entradas cuja chave satisfaz 'match'
+        with self._lock:
+            for key in [k for k in self._data if match(k)]: del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
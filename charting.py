@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+
+# --- REDUÇÃO DO GRÁFICO NO SERVIDOR ---
+# O navegador recebe só o que cabe na tela: o período escolhido, candles
+# semanais quando há pregões demais para candles diários legíveis, e linhas
+# reduzidas por LTTB (preserva picos e vales, ao contrário de pular pontos).
+RANGES = {'3M': pd.DateOffset(months=3), '6M': pd.DateOffset(months=6),
+          '1A': pd.DateOffset(years=1), '2A': None}
+DEFAULT_RANGE = '1A'
+CANDLE_LIMIT = 160   # Acima disso, candles semanais
+MAX_POINTS = 300     # Pontos por linha depois do LTTB
+WEEKLY = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last'}
+
+
+def lttb(y, threshold):
+    # Largest-Triangle-Three-Buckets: índices dos 'threshold' pontos que mantêm o
+    # desenho da série. O eixo x é a posição do pregão (datas equiespaçadas).
+    n = len(y)
+    if threshold >= n or threshold < 3: return np.arange(n)
+    x = np.arange(n, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    out = np.empty(threshold, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Média do balde seguinte: terceiro vértice do triângulo
+        nxt = slice(hi, edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def downsample(series, threshold=MAX_POINTS):
+    series = series.dropna()  # Médias longas começam com NaN
+    return series.iloc[lttb(series.to_numpy(dtype=float), threshold)]
+
+
+def prepare_chart(df_chart, period=DEFAULT_RANGE, max_points=MAX_POINTS, candle_limit=CANDLE_LIMIT):
+    # Recorta o período e reduz a série para o que o gráfico desenha:
+    # {'candles': OHLC diário ou semanal, 'lines': {coluna: série}, 'hist': histograma do MACD}
+    offset = RANGES.get(period)
+    if offset is not None and not df_chart.empty:
+        df_chart = df_chart[df_chart.index > df_chart.index[-1] - offset]
+
+    candles = df_chart[list(WEEKLY)]
+    hist = df_chart['MACD'] - df_chart['MACD_S'] if 'MACD' in df_chart else None
+    if len(df_chart) > candle_limit:
+        # Semana fechada na sexta, rotulada pela sexta-feira
+        candles = candles.resample('W-FRI').agg(WEEKLY).dropna()
+        if hist is not None: hist = hist.resample('W-FRI').last().dropna()
+
+    lines = {c: downsample(df_chart[c], max_points)
+             for c in ('SMA20', 'SMA200', 'MACD') if c in df_chart}
+    return {'candles': candles, 'lines': lines, 'hist': hist, 'weekly': len(df_chart) > candle_limit}
@@ -0,0 +1,86 @@
+import os
+import re
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+# --- ARMAZÉM LOCAL DE PROVENTOS ---
+# Um Feather (Date, Dividends) por ticker, só com os eventos, por data-com sem
+# fuso. O arquivo existe desde a carga inicial do histórico completo: arquivo
+# vazio é ticker sem proventos, arquivo ausente é ticker nunca carregado. Depois
+# disso só entram eventos novos (os que vêm junto do download incremental de
+# cotações); em datas repetidas vale o mais recente.
+class DividendStore:
+    def __init__(self, root):
+        self.root = root
+        self.version = 0  # Muda a cada gravação: chave de cache de quem lê
+        self._loaded = {}  # ticker -> (mtime do arquivo, eventos)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, ticker):
+        return os.path.join(self.root, re.sub(r'[^A-Za-z0-9._-]', '_', ticker) + '.feather')
+
+    def known(self, ticker):
+        return os.path.exists(self._path(ticker))
+
+    def load(self, ticker):
+        # Eventos em memória enquanto o arquivo não mudar (o worker grava em outro processo)
+        path = self._path(ticker)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._loaded.get(ticker)
+        if entry is not None and entry[0] == mtime: return entry[1]
+        try:
+            df = feather.read_table(path).to_pandas()
+        except (OSError, pa.ArrowInvalid):
+            return None
+        events = pd.Series(df['Dividends'].to_numpy(dtype=float), index=pd.DatetimeIndex(df['Date']), name='Dividends')
+        with self._lock:
+            self._loaded[ticker] = (mtime, events)
+        return events
+
+    @staticmethod
+    def normalize(events):
+        # Datas do provedor (com fuso da bolsa) viram datas locais sem fuso; zeros
+        # são dias sem provento nas colunas de eventos do download de cotações
+        if events is None: return pd.Series(dtype=float, name='Dividends')
+        events = events[events.fillna(0) != 0].astype(float)
+        idx = pd.DatetimeIndex(events.index)
+        if idx.tz is not None: idx = idx.tz_localize(None)
+        return pd.Series(events.to_numpy(), index=idx.normalize(), name='Dividends')
+
+    def append(self, ticker, events):
+        # Junta os eventos aos gravados; só regrava o arquivo se algo mudou
+        new = self.normalize(events)
+        old = self.load(ticker)
+        if old is not None:
+            merged = pd.concat([old, new])
+            merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+            if merged.equals(old): return old
+        else:
+            merged = new[~new.index.duplicated(keep='last')].sort_index()
+        self.save(ticker, merged)
+        return merged
+
+    def save(self, ticker, events):
+        path = self._path(ticker)
+        tmp = path + '.tmp'
+        out = pd.DataFrame({'Date': events.index, 'Dividends': events.to_numpy(dtype=float)})
+        feather.write_feather(out, tmp, compression='uncompressed')
+        os.replace(tmp, path)  # Troca atômica: leitores nunca veem arquivo pela metade
+        with self._lock:
+            self._loaded.pop(ticker, None)
+            self.version += 1
+
+    def delete(self, ticker):
+        path = self._path(ticker)
+        if os.path.exists(path): os.remove(path)
+        with self._lock:
+            self._loaded.pop(ticker, None)
+            self.version += 1
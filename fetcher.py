@@ -0,0 +1,144 @@
+import time
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from metrics import METRICS
+
+
+# --- LIMITADOR DE TAXA (TOKEN BUCKET) ---
+# Compartilhado por todas as threads: 'rate' requisições por segundo, com
+# rajadas de até 'burst'. Substitui os time.sleep fixos entre chamadas.
+class RateLimiter:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            METRICS.incr('rate_limit_wait_seconds_total', wait)
+            time.sleep(wait)
+
+
+# --- COALESCÊNCIA DE REQUISIÇÕES (SINGLE-FLIGHT) ---
+# Chamadas concorrentes com a mesma chave compartilham uma única execução:
+# quando o TTL vence com várias sessões abertas, só a primeira vai à rede e
+# as outras esperam o resultado dela.
+class SingleFlight:
+    def __init__(self, timeout=60):
+        # Quem espera desiste após 'timeout' e executa por conta própria: uma
+        # espera dentro do pool nunca trava quem depende do mesmo pool
+        self.timeout = timeout
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def claim(self, keys):
+        # Devolve (chaves assumidas por quem chamou, futures das que já estavam em andamento)
+        owned, waiting = [], []
+        with self._lock:
+            for key in keys:
+                if key in self._inflight:
+                    waiting.append(self._inflight[key])
+                else:
+                    self._inflight[key] = Future()
+                    owned.append(key)
+        if waiting: METRICS.incr('coalesced_total', len(waiting))
+        return owned, waiting
+
+    def release(self, keys, result=None, error=None):
+        with self._lock:
+            futures = [self._inflight.pop(key) for key in keys]
+        for future in futures:
+            if error is not None: future.set_exception(error)
+            else: future.set_result(result)
+
+    def wait(self, futures):
+        for future in futures:
+            try: future.result(self.timeout)
+            except TimeoutError: METRICS.incr('coalesce_timeouts_total')
+            except Exception: pass  # Quem executou já registrou a falha
+
+    def do(self, key, fn, *args, **kwargs):
+        owned, waiting = self.claim([key])
+        if waiting:
+            try: return waiting[0].result(self.timeout)
+            except TimeoutError: METRICS.incr('coalesce_timeouts_total')
+            return fn(*args, **kwargs)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as exc:
+            self.release(owned, error=exc)
+            raise
+        self.release(owned, result)
+        return result
+
+
+# --- CAMADA DE DOWNLOAD ---
+# Pool de threads limitado + rate limiter + retentativas com backoff exponencial
+# e jitter. Falhas não somem mais num 'except:' — ficam em 'errors' por chave
+# (tipo, ticker): o erro das cotações não apaga o dos proventos do mesmo ticker.
+class Fetcher:
+    def __init__(self, max_workers=8, rate=4, burst=8, retries=3, backoff=0.5, max_backoff=8):
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.errors = {}
+        self.flight = SingleFlight()  # Compartilhado pelos motores que usam este fetcher
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fetch')
+        # Revalidações em segundo plano têm executor próprio: elas mesmas usam o
+        # pool principal, e dividir o mesmo pool poderia travar por falta de threads
+        self._background = ThreadPoolExecutor(max_workers=2, thread_name_prefix='revalidate')
+        self._lock = threading.Lock()
+
+    def call(self, key, fn, *args, **kwargs):
+        # Executa fn com rate limit e retentativas; devolve None se todas falharem.
+        # key: (tipo, ticker), como ('prices', 'SLCE3.SA'), ou (tipo, descrição do lote)
+        for attempt in range(self.retries):
+            self.limiter.acquire()
+            if attempt: METRICS.incr('retries_total')
+            METRICS.incr('network_calls_total')
+            try:
+                with METRICS.span('network_call'):
+                    result = fn(*args, **kwargs)
+            except Exception as exc:
+                self._record(key, exc)
+                METRICS.incr('swallowed_exceptions_total', source='fetcher', error=type(exc).__name__)
+                if attempt + 1 < self.retries:
+                    # "Full jitter": espera aleatória até o teto exponencial
+                    time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+                continue
+            with self._lock:
+                self.errors.pop(key, None)
+            return result
+        return None
+
+    def map(self, fn, items):
+        # Aplica fn em paralelo no pool; devolve os resultados na ordem de entrada
+        return list(self._pool.map(fn, items))
+
+    def submit(self, fn, *args, **kwargs):
+        return self._pool.submit(fn, *args, **kwargs)
+
+    def background(self, fn, *args, **kwargs):
+        return self._background.submit(fn, *args, **kwargs)
+
+    def describe_errors(self):
+        # 'tipo ticker' -> mensagem, na ordem das chaves
+        with self._lock:
+            return {f"{kind} {ticker}": err for (kind, ticker), err in sorted(self.errors.items())}
+
+    def _record(self, key, exc):
+        with self._lock:
+            self.errors[key] = f"{type(exc).__name__}: {exc}"
@@ -0,0 +1,148 @@
+import math
+from collections import deque
+
+
+# --- INDICADORES INCREMENTAIS ---
+# Cada indicador guarda seu estado (somas da janela, médias exponenciais) e
+# processa uma barra nova em O(1). update(x, replace=True) revisa a última
+# barra em vez de acrescentar outra: é o caso do candle do dia durante o pregão.
+NAN = float('nan')
+
+
+class EMA:
+    # Mesma recursão do ewm(adjust=False) do pandas usado pela 'ta', inclusive
+    # a normalização pelo peso, para bater bit a bit com o cálculo completo
+    def __init__(self, alpha, min_periods):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.weighted = NAN
+        self.nobs = 0
+        self._prev = (NAN, 0)
+
+    def update(self, x, replace=False):
+        if replace: self.weighted, self.nobs = self._prev
+        else: self._prev = (self.weighted, self.nobs)
+        if x != x: return self.value  # NaN no início da série é ignorado, como no pandas
+        self.nobs += 1
+        if self.weighted != self.weighted:
+            self.weighted = x
+        elif self.weighted != x:
+            old_wt = 1. - self.alpha
+            self.weighted = (old_wt * self.weighted + self.alpha * x) / (old_wt + self.alpha)
+        return self.value
+
+    @property
+    def value(self):
+        return self.weighted if self.nobs >= self.min_periods else NAN
+
+
+class RollingWindow:
+    # Média e desvio padrão populacional (ddof=0) de janela fixa, com
+    # atualização de Welford para entrada/saída de valores
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.avg = 0.0
+        self.m2 = 0.0
+
+    def _swap(self, old, new):
+        delta = new - old
+        old_avg = self.avg
+        self.avg += delta / len(self.values)
+        self.m2 += delta * (new - self.avg + old - old_avg)
+
+    def update(self, x, replace=False):
+        if replace:
+            old, self.values[-1] = self.values[-1], x
+            self._swap(old, x)
+        elif len(self.values) < self.window:
+            self.values.append(x)
+            delta = x - self.avg
+            self.avg += delta / len(self.values)
+            self.m2 += delta * (x - self.avg)
+        else:
+            old = self.values.popleft()
+            self.values.append(x)
+            self._swap(old, x)
+
+    @property
+    def mean(self):
+        return self.avg if len(self.values) == self.window else NAN
+
+    @property
+    def std(self):
+        if len(self.values) < self.window: return NAN
+        return math.sqrt(max(self.m2, 0.0) / self.window)
+
+
+class RSI:
+    # RSI de Wilder como na ta.momentum.RSIIndicator: a primeira barra entra
+    # com variação zero e o valor só existe a partir da 'window'-ésima barra
+    def __init__(self, window=14):
+        self.up = EMA(1 / window, window)
+        self.down = EMA(1 / window, window)
+        self.close = NAN
+        self.before = NAN
+
+    def update(self, x, replace=False):
+        if not replace: self.before = self.close
+        self.close = x
+        diff = x - self.before
+        self.up.update(diff if diff > 0 else 0.0, replace)
+        self.down.update(-diff if diff < 0 else 0.0, replace)
+
+    @property
+    def value(self):
+        up, down = self.up.value, self.down.value
+        if down == 0: return 100.0
+        return 100 - (100 / (1 + up / down))
+
+
+class MACDState:
+    def __init__(self, fast=12, slow=26, sign=9):
+        self.fast = EMA(2 / (fast + 1), fast)
+        self.slow = EMA(2 / (slow + 1), slow)
+        self.signal = EMA(2 / (sign + 1), sign)
+
+    def update(self, x, replace=False):
+        macd = self.fast.update(x, replace) - self.slow.update(x, replace)
+        self.signal.update(macd, replace)
+
+    @property
+    def value(self):
+        return self.fast.value - self.slow.value
+
+
+class IndicatorState:
+    # Conjunto de TechnicalEngine.calculate_signals, barra a barra
+    def __init__(self):
+        self.sma20 = RollingWindow(20)  # também serve de base para as Bandas de Bollinger
+        self.sma50 = RollingWindow(50)
+        self.sma200 = RollingWindow(200)
+        self.rsi = RSI(14)
+        self.macd = MACDState()
+        self.last_index = None
+        self.close = NAN
+
+    @classmethod
+    def from_close(cls, close):
+        state = cls()
+        for ts, x in close.items(): state.update(float(x), ts)
+        return state
+
+    def update(self, x, ts):
+        # Mesma data da última barra = revisão do candle corrente
+        replace = ts == self.last_index
+        for ind in (self.sma20, self.sma50, self.sma200, self.rsi, self.macd):
+            ind.update(x, replace)
+        self.last_index = ts
+        self.close = x
+
+    def values(self):
+        std = self.sma20.std
+        return {
+            'SMA20': self.sma20.mean, 'SMA50': self.sma50.mean, 'SMA200': self.sma200.mean,
+            'RSI': self.rsi.value,
+            'MACD': self.macd.value, 'MACD_S': self.macd.signal.value,
+            'BB_H': self.sma20.mean + 2 * std, 'BB_L': self.sma20.mean - 2 * std,
+        }
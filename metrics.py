@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+# --- INSTRUMENTAÇÃO DOS CAMINHOS QUENTES ---
+# Spans (tempo de execução) e contadores, por processo. O painel de
+# diagnóstico do app lê daqui; export em JSON ou no formato texto do Prometheus.
+class Metrics:
+    def __init__(self, prefix='agro'):
+        self.prefix = prefix
+        self._spans = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            s = self._spans.setdefault(key, {'count': 0, 'sum': 0.0, 'max': 0.0, 'last': 0.0})
+            s['count'] += 1
+            s['sum'] += seconds
+            s['max'] = max(s['max'], seconds)
+            s['last'] = seconds
+
+    def incr(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def span(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name):
+        # Decorador: @METRICS.timed('get_data')
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        with self._lock:
+            spans = [dict(name=n, labels=dict(l), **v) for (n, l), v in self._spans.items()]
+            counters = [dict(name=n, labels=dict(l), value=v) for (n, l), v in self._counters.items()]
+        return {'spans': sorted(spans, key=lambda s: -s['sum']),
+                'counters': sorted(counters, key=lambda c: (c['name'], sorted(c['labels'].items())))}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, ensure_ascii=False)
+
+    def to_prometheus(self):
+        snap = self.snapshot()
+        fmt = lambda labels: '{' + ','.join(f'{k}="{v}"' for k, v in sorted(labels.items())) + '}' if labels else ''
+        lines = []
+        span_metric = f"{self.prefix}_span_seconds"
+        if snap['spans']:
+            lines.append(f"# TYPE {span_metric} summary")
+            for s in snap['spans']:
+                labels = fmt(dict(s['labels'], span=s['name']))
+                lines.append(f"{span_metric}_count{labels} {s['count']}")
+                lines.append(f"{span_metric}_sum{labels} {s['sum']:.6f}")
+            lines.append(f"# TYPE {span_metric}_max gauge")
+            for s in snap['spans']:
+                lines.append(f"{span_metric}_max{fmt(dict(s['labels'], span=s['name']))} {s['max']:.6f}")
+        typed = set()
+        for c in snap['counters']:
+            metric = f"{self.prefix}_{c['name']}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{fmt(c['labels'])} {c['value']}")
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics()
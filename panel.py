@@ -0,0 +1,237 @@
+import numpy as np
+import pandas as pd
+
+
+# --- PAINEL DE PREÇOS (BARRAS x TICKERS) ---
+# B3, NYSE e CME têm calendários diferentes: alinhar por data encheria o painel
+# de buracos e mudaria as médias. O alinhamento é pela barra, a partir do fim:
+# a última linha é o último pregão de cada ativo. Assim cada coluna reproduz
+# o cálculo feito ativo a ativo com a biblioteca 'ta'.
+def build_panel(frames, field='Close'):
+    frames = {t: df for t, df in frames.items() if df is not None and not df.empty}
+    return panel_from_arrays({t: df[field].to_numpy() for t, df in frames.items()})
+
+
+def panel_from_arrays(arrays):
+    # {ticker: série de valores} -> painel alinhado pelo fim
+    if not arrays: return pd.DataFrame()
+    rows = max(len(v) for v in arrays.values())
+    data = np.full((rows, len(arrays)), np.nan)
+    for j, values in enumerate(arrays.values()):
+        data[rows - len(values):, j] = values
+    return pd.DataFrame(data, columns=list(arrays))
+
+
+def _rolling_mean(x, window):
+    # Média móvel por soma acumulada: O(T) por coluna, todas as colunas juntas.
+    # Como o painel só tem NaN no começo, a janela está completa quando o
+    # valor mais antigo dela é válido.
+    sums = np.cumsum(np.nan_to_num(x), axis=0)
+    window_sum = sums[window - 1:].copy()
+    window_sum[1:] -= sums[:-window]
+    out = np.full(x.shape, np.nan)
+    out[window - 1:] = np.where(np.isnan(x[:len(x) - window + 1]), np.nan, window_sum / window)
+    return out
+
+
+def _warmup(valid, n):
+    # Linhas com menos de n observações válidas até ali, por coluna. Com NaN só
+    # no começo, a contagem é a distância da primeira válida; soma acumulada
+    # só nas colunas com buracos.
+    first, count = valid.argmax(axis=0), valid.sum(axis=0)
+    mask = np.arange(len(valid))[:, None] < first + n - 1
+    mask[:, count == 0] = True
+    gaps = (count > 0) & (count < len(valid) - first)
+    if gaps.any(): mask[:, gaps] = np.cumsum(valid[:, gaps], axis=0) < n
+    return mask, gaps
+
+
+def _ewm(x, alpha, min_periods):
+    # ewm(adjust=False) do pandas como filtro IIR (lfilter, em C): y = (1 - a) y' + a x.
+    # Com NaN só no começo, a recursão parte do primeiro valor válido; os NaN
+    # anteriores viram esse valor, que é ponto fixo do filtro. Colunas com
+    # buracos no meio seguem a recursão completa do pandas.
+    from scipy.signal import lfilter
+    valid = ~np.isnan(x)
+    first = valid.argmax(axis=0)
+    seed = x[first, np.arange(x.shape[1])]
+    filled = x if valid.all() else np.where(valid, x, seed)
+    out, _ = lfilter([alpha], [1, alpha - 1], filled, axis=0, zi=((1 - alpha) * seed)[None, :])
+    warmup, gaps = _warmup(valid, min_periods)
+    out[warmup] = np.nan
+    if gaps.any(): out[:, gaps] = _ewm_gaps(x[:, gaps], alpha, min_periods)
+    return out
+
+
+def _ewm_gaps(x, alpha, min_periods):
+    # Mesma recursão do ewm(adjust=False) do pandas, incluindo a normalização
+    # pelo peso nos buracos, vetorizada nas colunas (o laço é só no tempo)
+    out = np.full(x.shape, np.nan)
+    weighted = np.full(x.shape[1], np.nan)
+    old_wt = np.ones(x.shape[1])
+    nobs = np.zeros(x.shape[1])
+    for t in range(x.shape[0]):
+        cur = x[t]
+        obs = ~np.isnan(cur)
+        started = ~np.isnan(weighted)
+        nobs += obs
+        old_wt = np.where(started, old_wt * (1 - alpha), old_wt)
+        with np.errstate(invalid='ignore'):
+            upd = started & obs & (weighted != cur)
+            mixed = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        weighted = np.where(upd, mixed, weighted)
+        old_wt = np.where(started & obs, 1.0, old_wt)
+        weighted = np.where(~started & obs, cur, weighted)
+        out[t] = np.where(nobs >= min_periods, weighted, np.nan)
+    return out
+
+
+def _rsi(x, last=False):
+    # RSI de Wilder, como em ta.momentum.RSIIndicator; last=True só na última barra
+    diff = np.diff(x, axis=0, prepend=np.nan)
+    up, down = np.fmax(diff, 0), np.fmax(-diff, 0)  # fmax: NaN vira 0
+    ema_up, ema_dn = _ewm(up, 1 / 14, 14), _ewm(down, 1 / 14, 14)
+    # Linhas antes do início do ativo contam como observação no ewm: descarta
+    # as 13 primeiras barras de cada coluna, como o min_periods faz no 'ta'
+    warmup = _warmup(~np.isnan(x), 14)[0]
+    if last: ema_up, ema_dn, warmup = ema_up[-1], ema_dn[-1], warmup[-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rsi = np.where(ema_dn == 0, 100, 100 - (100 / (1 + ema_up / ema_dn)))
+    rsi[warmup] = np.nan
+    return rsi
+
+
+def panel_signals(close, bands=True):
+    # Mesmos indicadores de TechnicalEngine.calculate_signals, todas as colunas de uma vez.
+    # bands=False pula as Bandas de Bollinger, que o score não usa.
+    x = close.to_numpy(dtype=float)
+    wrap = lambda v: pd.DataFrame(v, index=close.index, columns=close.columns)
+    i = {}
+    sma20 = _rolling_mean(x, 20)
+    i['SMA20'] = wrap(sma20)
+    i['SMA50'] = wrap(_rolling_mean(x, 50))
+    i['SMA200'] = wrap(_rolling_mean(x, 200))
+
+    i['RSI'] = wrap(_rsi(x))
+
+    macd = _ewm(x, 2 / 13, 12) - _ewm(x, 2 / 27, 26)
+    i['MACD'] = wrap(macd)
+    i['MACD_S'] = wrap(_ewm(macd, 2 / 10, 9))
+    if not bands: return i
+
+    # Desvio padrão populacional (ddof=0) sobre a série centrada, para não
+    # perder precisão na diferença de somas acumuladas
+    centered = x - np.nanmean(x, axis=0)
+    mean_c = _rolling_mean(centered, 20)
+    var = np.maximum(_rolling_mean(centered ** 2, 20) - mean_c ** 2, 0)
+    std = np.sqrt(var)
+    i['BB_H'] = wrap(sma20 + 2 * std)
+    i['BB_L'] = wrap(sma20 - 2 * std)
+    return i
+
+
+def last_signals(close, bands=True):
+    # Os indicadores de panel_signals só na última barra de cada coluna, em
+    # Series indexadas pelos tickers. As médias e as bandas saem da última janela; RSI e MACD
+    # precisam da recursão inteira, mas o filtro é em C.
+    if close.empty: return {}
+    x = close.to_numpy(dtype=float)
+    wrap = lambda v: pd.Series(v, index=close.columns)
+    # Janela incompleta (ou com NaN) dá NaN, como no rolling
+    window = lambda w: x[-w:] if len(x) >= w else np.full((w, x.shape[1]), np.nan)
+    i = {'SMA20': wrap(window(20).mean(axis=0)),
+         'SMA50': wrap(window(50).mean(axis=0)),
+         'SMA200': wrap(window(200).mean(axis=0))}
+    i['RSI'] = wrap(_rsi(x, last=True))
+    macd = _ewm(x, 2 / 13, 12) - _ewm(x, 2 / 27, 26)
+    i['MACD'] = wrap(macd[-1])
+    i['MACD_S'] = wrap(_ewm(macd, 2 / 10, 9)[-1])
+    if not bands: return i
+    std = window(20).std(axis=0)  # Populacional (ddof=0), como no 'ta'
+    i['BB_H'] = i['SMA20'] + 2 * std
+    i['BB_L'] = i['SMA20'] - 2 * std
+    return i
+
+
+STATUS_LABELS = np.array(["🟢 COMPRA FORTE", "🟢 COMPRA", "⚪ NEUTRO", "🔴 VENDA"])
+
+
+def score_codes(close, sma20, sma50, sma200, rsi, macd, macd_s):
+    # Regras de TechnicalEngine.generate_tech_score como operações vetoriais.
+    # Funciona com a última linha (vetor) ou com o painel inteiro (matriz).
+    # Comparações com NaN dão False, igual à versão escalar. O status sai como
+    # índice em STATUS_LABELS: matrizes grandes não carregam strings.
+    with np.errstate(invalid='ignore'):
+        score = 10 * (close > sma20) + 15 * (close > sma50) + 20 * (close > sma200)
+        score = score + np.select([rsi < 30, (rsi >= 30) & (rsi <= 60), rsi > 70], [25, 10, -10], 0)
+        score = score + 20 * (macd > macd_s)
+    final = np.clip(score, 0, 100)
+    code = np.select([final >= 75, final >= 60, final >= 40], [0, 1, 2], 3)
+    return final, code
+
+
+def score_arrays(close, sma20, sma50, sma200, rsi, macd, macd_s):
+    final, code = score_codes(close, sma20, sma50, sma200, rsi, macd, macd_s)
+    return final, STATUS_LABELS[code]
+
+
+def score_shard(closes):
+    # Unidade de trabalho do modo multiprocesso: {ticker: array de fechamentos}
+    # -> scores. Só os arrays atravessam o processo, não os DataFrames.
+    return score_panel(panel_from_arrays(closes))
+
+
+def score_panel(close):
+    # Score/status do último pregão de cada coluna do painel
+    if close.empty: return pd.DataFrame(columns=['Score', 'Status', 'Close', 'PrevClose'])
+    last = {k: v.to_numpy() for k, v in last_signals(close, bands=False).items()}
+    values = close.to_numpy()
+    score, status = score_arrays(values[-1], last['SMA20'], last['SMA50'], last['SMA200'],
+                                 last['RSI'], last['MACD'], last['MACD_S'])
+    return pd.DataFrame({'Score': score.astype(int), 'Status': status,
+                         'Close': values[-1], 'PrevClose': values[-2]}, index=close.columns)
+
+
+# --- DY DE 12 MESES (DATAS x TICKERS) ---
+# Aqui o alinhamento é por data: o provento vale no calendário corrido. Todos os
+# eventos do universo ficam numa única linha ordenada por (ticker, data), com
+# chave = coluna * período + dia; a soma dos últimos 'days' dias de cada célula
+# do painel sai de duas buscas binárias sobre a soma acumulada, sem laço.
+def unadjusted_close(close, events):
+    # O armazém guarda fechamentos ajustados por proventos (auto_adjust): antes
+    # da data-com d, o Yahoo multiplica tudo por f = 1 - D / fechamento bruto da
+    # véspera. Desfaz do evento mais novo para o mais antigo; o fechamento bruto
+    # da véspera é o ajustado dividido pelos fatores dos eventos posteriores, mais D.
+    if events is None or events.empty or close.empty: return close
+    values = close.to_numpy(dtype=float)
+    day = close.index.to_numpy(dtype='datetime64[D]')
+    amounts = events.groupby(events.index.to_numpy(dtype='datetime64[D]')).sum()
+    factor, later = np.ones(len(values)), 1.0
+    for d, amount in zip(amounts.index[::-1], amounts.to_numpy(dtype=float)[::-1]):
+        pos = np.searchsorted(day, np.datetime64(d, 'D'), 'left')
+        if pos == 0 or pos >= len(values) or not amount: continue
+        f = 1 - amount / (values[pos - 1] / later + amount)
+        factor[:pos] *= f
+        later *= f
+    return pd.Series(values / factor, index=close.index, name=close.name)
+
+
+def ttm_yield(frames, events, days=365):
+    # frames: {ticker: OHLC com datas}; events: {ticker: proventos por data-com}
+    # Devolve o DY em % de cada pregão; NaN nos dias sem pregão do ativo. O
+    # divisor é o fechamento bruto: com o ajustado, o DY do passado sairia inflado.
+    close = pd.DataFrame({t: unadjusted_close(df['Close'], events.get(t))
+                          for t, df in frames.items() if df is not None and not df.empty},
+                         dtype=float).sort_index()
+    if close.empty: return close
+    day = close.index.to_numpy(dtype='datetime64[D]').astype(np.int64)
+    evs = [events.get(t) if events.get(t) is not None else pd.Series(dtype=float) for t in close.columns]
+    ev_day = [e.index.to_numpy(dtype='datetime64[D]').astype(np.int64) for e in evs]
+    base = min([day[0]] + [d[0] for d in ev_day if len(d)])
+    period = max([day[-1]] + [d[-1] for d in ev_day if len(d)]) - base + days + 2
+
+    keys = np.concatenate([j * period + (d - base) for j, d in enumerate(ev_day)] + [np.empty(0, np.int64)])
+    cum = np.concatenate([[0.0], np.cumsum(np.concatenate([e.to_numpy(dtype=float) for e in evs] + [np.empty(0)]))])
+    hi = np.arange(len(evs))[None, :] * period + (day - base)[:, None]
+    ttm = cum[np.searchsorted(keys, hi, 'right')] - cum[np.searchsorted(keys, hi - days, 'right')]
+    return pd.DataFrame(ttm / close.to_numpy() * 100, index=close.index, columns=close.columns)
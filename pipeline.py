@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from panel import build_panel, last_signals
+from risk import RiskModel, GROUPS, cluster, groups, heatmap_view, returns_matrix, rolling_volatility
+
+
+# --- PIPELINE COMPLETO: COTAÇÕES -> SCORES -> FUNDAMENTOS -> TABELA ---
+# Usado pelo worker (snapshot em disco) e pelo app quando não há snapshot.
+# A tabela sai completa, sem filtros de tela: score mínimo e busca são
+# aplicados depois, por quem exibe.
+RESULT_COLUMNS = ["Ticker", "Nome", "Preço", "Var%", "Score Téc.", "Score Fund.",
+                  "DY%", "Insight", "Status", "Ativo"]
+CHART_COLUMNS = ['Open', 'High', 'Low', 'Close', 'SMA20', 'SMA200', 'MACD', 'MACD_S']
+
+
+def build_results(db, tech, fund, category):
+    assets = db.assets[category]
+    scores = tech.score_universe(list(assets))
+    fund.prefetch({t: category for t in scores.index})
+
+    rows = []
+    for ticker, row in scores.iterrows():
+        t_score, t_status = int(row['Score']), row['Status']
+        f_data = fund.get_fundamentals(ticker, category)
+        f_score, f_status = fund.generate_fund_score(f_data, category)
+
+        price = row['Close']
+        var_pct = ((price / row['PrevClose']) - 1) * 100
+        dy_val = f_data['DY'] if f_data else 0
+
+        rows.append({
+            "Ticker": db.display(ticker),
+            "Nome": assets[ticker],
+            "Preço": price,
+            "Var%": var_pct,
+            "Score Téc.": t_score,
+            "Score Fund.": f_score,
+            "DY%": dy_val,
+            "Insight": fund.generate_insight(t_score, f_score, dy_val, category),
+            "Status": t_status,
+            "Ativo": ticker,  # Ticker completo (com .SA / =F) para o gráfico
+        })
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS).sort_values("Score Téc.", ascending=False)
+
+
+def build_chart_series(tech, ticker):
+    # Candles + indicadores que o gráfico de "Análise Gráfica" desenha
+    entry = tech.analyze(ticker)
+    if entry is None: return None
+    # Um bloco float32 somente leitura, como as cotações do cache: é o que vai
+    # para o snapshot e é compartilhado entre as sessões
+    df, inds = entry['df'], entry['signals']
+    columns = [df[c] if c in df else inds[c] for c in CHART_COLUMNS]
+    values = np.column_stack([c.to_numpy(dtype=np.float32) for c in columns])
+    values.setflags(write=False)
+    return pd.DataFrame(values, index=df.index, columns=CHART_COLUMNS, copy=False)
+
+
+def build_risk(db, tech, model=None):
+    # Correlação e volatilidade do universo inteiro a partir das cotações em
+    # cache. 'model' (RiskModel) guarda as somas da janela entre chamadas: com
+    # ele, uma barra nova custa uma atualização de posto baixo, não a matriz toda.
+    model = model or RiskModel()
+    frames = tech.prefetch(db.get_tickers())
+    returns = returns_matrix(frames, model.window)
+    if returns.shape[1] < 2: return None
+    with model.lock:
+        model.update(returns)
+        corr, vol = model.correlation(), model.volatility()
+    z, order = cluster(corr)
+    view, members = heatmap_view(corr, z, order)
+    n = len(corr)
+    table = pd.DataFrame({
+        "Ticker": [db.display(t) for t in corr.columns],
+        "Categoria": [db.get_info(t)[1] for t in corr.columns],
+        "Vol 1m %": rolling_volatility(returns).iloc[-1].to_numpy(),
+        "Vol 12m %": vol.to_numpy(),
+        "Corr. média": (corr.to_numpy(dtype=np.float64).sum(axis=1) - 1) / (n - 1),
+        "Grupo": groups(z, order, GROUPS),
+    }).sort_values(["Grupo", "Corr. média"], ascending=[True, False])
+    return {'heatmap': view, 'members': members, 'table': table,
+            'mean_corr': float(table["Corr. média"].mean()), 'window': len(returns)}
+
+
+def build_alert_frame(db, tech, results):
+    # Entrada do AlertEngine: uma linha por ativo do universo com a saída da
+    # tabela (scores, DY, status) e os indicadores da última barra, calculados
+    # no painel de fechamentos inteiro de uma vez
+    tables = [df.assign(Categoria=cat) for cat, df in results.items() if not df.empty]
+    if not tables: return pd.DataFrame()
+    table = pd.concat(tables).set_index('Ativo')
+    close = build_panel(tech.prefetch(list(table.index)))
+    last = pd.DataFrame(last_signals(close, bands=False))
+    return table.join(last)
+
+
+def build_dy_history(fund, tickers):
+    # DY de 12 meses de cada pregão gravado, em pontos semanais
+    return fund.dy_history(list(tickers)).resample('W').last()
+
+
+def build_snapshot(db, tech, fund, risk_model=None):
+    tech.prefetch(db.get_tickers())
+    # Proventos de todo pagador carregados aqui: a página lê o DY do snapshot
+    # e não vai à rede, mesmo para quem tem o DY pronto no .info
+    payers = [t for cat, assets in db.assets.items() if cat != 'Commodities' for t in assets]
+    fund.backfill(payers)
+    categories = {cat: build_results(db, tech, fund, cat) for cat in db.assets}
+    charts = {}
+    for ticker in db.get_tickers():
+        series = build_chart_series(tech, ticker)
+        if series is not None: charts[ticker] = series
+    return {'categories': categories, 'charts': charts, 'risk': build_risk(db, tech, risk_model),
+            'dy_history': build_dy_history(fund, payers)}
@@ -0,0 +1,62 @@
+import os
+import re
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+# --- ARMAZÉM LOCAL DE COTAÇÕES (OHLCV) ---
+# Um arquivo Feather (Arrow IPC, sem compressão) por ticker. Sem compressão
+# a leitura usa memory mapping: recarregar o histórico não copia o arquivo.
+class PriceStore:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, ticker):
+        # "ZC=F" e afins viram nomes de arquivo seguros
+        return os.path.join(self.root, re.sub(r'[^A-Za-z0-9._-]', '_', ticker) + '.feather')
+
+    def load(self, ticker):
+        path = self._path(ticker)
+        if not os.path.exists(path): return None
+        try:
+            df = feather.read_table(path, memory_map=True).to_pandas()
+        except (OSError, pa.ArrowInvalid):
+            return None
+        return df.set_index('Date')
+
+    def last_date(self, ticker):
+        # Lê só a coluna de datas para decidir de onde começar o download incremental
+        path = self._path(ticker)
+        if not os.path.exists(path): return None
+        try:
+            dates = feather.read_table(path, columns=['Date'], memory_map=True).column('Date')
+        except (OSError, pa.ArrowInvalid, KeyError):
+            return None
+        if len(dates) == 0: return None
+        return pd.Timestamp(dates[-1].as_py())
+
+    def append(self, ticker, new):
+        # Junta as barras novas ao histórico; em datas repetidas vale a mais recente
+        # (a última barra do dia pode ter sido gravada ainda em pregão)
+        old = self.load(ticker)
+        if old is not None and not old.empty:
+            new = pd.concat([old, new])
+            new = new[~new.index.duplicated(keep='last')].sort_index()
+        self.save(ticker, new)
+        return new
+
+    def save(self, ticker, df):
+        path = self._path(ticker)
+        tmp = path + '.tmp'
+        out = df.copy()
+        out.index = pd.DatetimeIndex(out.index).tz_localize(None)
+        out.index.name = 'Date'
+        out.columns = [str(c) for c in out.columns]
+        feather.write_feather(out.reset_index(), tmp, compression='uncompressed')
+        os.replace(tmp, path)  # Troca atômica: leitores nunca veem arquivo pela metade
+
+    def delete(self, ticker):
+        path = self._path(ticker)
+        if os.path.exists(path): os.remove(path)
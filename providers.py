@@ -0,0 +1,226 @@
+import importlib
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+
+# --- IMPORTAÇÃO SOB DEMANDA ---
+# yfinance e requests são pesados e só servem a quem baixa dados: importados
+# no primeiro uso, não no import deste módulo (nem no de agro_analytics).
+class _LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None: self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+yf = _LazyModule('yfinance')
+requests = _LazyModule('requests')
+
+YAHOO_BATCH = 50   # Tickers por yf.download
+BRAPI_BATCH = 20   # Símbolos por requisição /quote do brapi
+BRAPI_URL = 'https://brapi.dev/api'
+# Menor 'range' do brapi que cobre N dias corridos desde a última barra gravada
+BRAPI_RANGES = [(4, '5d'), (28, '1mo'), (88, '3mo'), (180, '6mo'), (360, '1y'), (725, '2y'), (1820, '5y')]
+
+
+# --- PROVEDORES DE DADOS ---
+# Interface comum aos motores:
+#   history(tickers, start=None) -> {ticker: OHLCV}  (2 anos, ou a partir de 'start'),
+#       com a coluna 'Dividends' (provento na data-com, 0 nos outros dias)
+#   info(ticker) -> dict no formato do .info do Yahoo
+#   dividends(ticker) -> Series de proventos por data-com
+#   route(ticker) -> provedor que de fato atende o ticker; batch_size, name
+# Falhas levantam exceção: retentativa e registro ficam com o Fetcher.
+class YahooProvider:
+    name = 'yahoo'
+
+    def __init__(self, batch_size=YAHOO_BATCH):
+        self.batch_size = batch_size
+
+    def supports(self, ticker):
+        return True
+
+    def route(self, ticker):
+        return self
+
+    def history(self, tickers, start=None):
+        kwargs = dict(progress=False, auto_adjust=True, actions=True, group_by='ticker', threads=True)
+        # A última barra gravada é baixada de novo: pode ter sido salva no meio do pregão
+        if start is None: raw = yf.download(list(tickers), period='2y', **kwargs)
+        else: raw = yf.download(list(tickers), start=start.strftime('%Y-%m-%d'), **kwargs)
+        return self._split_batch(raw, list(tickers))
+
+    def info(self, ticker):
+        return yf.Ticker(ticker).info
+
+    def dividends(self, ticker):
+        return yf.Ticker(ticker).dividends
+
+    @staticmethod
+    def _split_batch(raw, tickers):
+        frames = {}
+        if raw is None or raw.empty: return frames
+        if not isinstance(raw.columns, pd.MultiIndex):
+            # Lote de um único ativo pode vir com colunas simples
+            raw = pd.concat({tickers[0]: raw}, axis=1)
+        available = raw.columns.get_level_values(0)
+        for ticker in tickers:
+            if ticker not in available: continue
+            # Calendários diferentes (B3, NYSE, CME) geram linhas vazias no painel
+            df = raw[ticker].dropna(how='all')
+            if not df.empty: frames[ticker] = df
+        return frames
+
+
+class BrapiProvider:
+    # Ativos da B3 (.SA) pelo brapi: uma requisição /quote traz, para até
+    # 'batch_size' símbolos, histórico diário, fundamentos e proventos. Os dois
+    # últimos ficam guardados ('extras_ttl') e atendem o FundamentalEngine sem
+    # nova ida à rede. Sessão HTTP única, com keep-alive e pool de conexões.
+    name = 'brapi'
+
+    def __init__(self, token, base_url=BRAPI_URL, batch_size=BRAPI_BATCH, pool_size=8,
+                 timeout=15, extras_ttl=3600):
+        self.base_url = base_url.rstrip('/')
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.extras_ttl = extras_ttl
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount(self.base_url, adapter)
+        if token: self.session.headers['Authorization'] = f'Bearer {token}'
+        self._extras = {}  # ticker -> (momento, info, proventos)
+        self._lock = threading.Lock()
+
+    def supports(self, ticker):
+        return ticker.endswith('.SA')
+
+    def route(self, ticker):
+        return self
+
+    def history(self, tickers, start=None):
+        frames = {}
+        for ticker, item in self._quote(tickers, self._range(start)).items():
+            df = self._frame(item.get('historicalDataPrice') or [])
+            # A data-com é um pregão: o provento cai na barra do mesmo dia
+            divs = self._dividends(item)
+            divs.index = divs.index.tz_localize(None).normalize()
+            df['Dividends'] = divs.groupby(level=0).sum().reindex(df.index, fill_value=0.0)
+            if start is not None: df = df[df.index >= pd.Timestamp(start)]
+            if not df.empty: frames[ticker] = df
+        return frames
+
+    def info(self, ticker):
+        return self._extra(ticker)[0]
+
+    def dividends(self, ticker):
+        return self._extra(ticker)[1]
+
+    def _extra(self, ticker):
+        with self._lock:
+            entry = self._extras.get(ticker)
+        if entry is None or time.time() - entry[0] > self.extras_ttl:
+            self._quote([ticker], '5d')
+            with self._lock:
+                entry = self._extras.get(ticker)
+        if entry is None: raise LookupError(f"brapi sem dados para {ticker}")
+        return entry[1], entry[2]
+
+    @staticmethod
+    def _range(start):
+        if start is None: return '2y'
+        days = (pd.Timestamp.now().normalize() - pd.Timestamp(start)).days
+        return next((r for limit, r in BRAPI_RANGES if days <= limit), 'max')
+
+    def _quote(self, tickers, range_):
+        symbols = {t.replace('.SA', ''): t for t in tickers}
+        resp = self.session.get(f"{self.base_url}/quote/{','.join(symbols)}", timeout=self.timeout, params={
+            'range': range_, 'interval': '1d', 'fundamental': 'true', 'dividends': 'true',
+            'modules': 'defaultKeyStatistics,financialData'})
+        resp.raise_for_status()
+        out, now = {}, time.time()
+        for item in resp.json().get('results', []):
+            ticker = symbols.get(item.get('symbol'))
+            if ticker is None: continue
+            out[ticker] = item
+            extras = (now, self._info(item), self._dividends(item))
+            with self._lock:
+                self._extras[ticker] = extras
+        return out
+
+    @staticmethod
+    def _frame(rows):
+        # Colunas montadas direto dos registros: DataFrame(lista de dicts) é lento
+        col = lambda key: np.array([r.get(key) for r in rows], dtype=float)
+        close = col('close')
+        ok = ~np.isnan(close)
+        if not ok.any(): return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        # Ajuste por proventos como o auto_adjust do Yahoo: OHLC escalados pelo fechamento ajustado
+        adjusted = col('adjustedClose')
+        factor = np.where(np.isnan(adjusted), 1.0, adjusted / close)
+        # Datas em epoch (UTC); a barra diária fica na data do pregão em São Paulo
+        idx = pd.to_datetime(col('date')[ok], unit='s', utc=True).tz_convert('America/Sao_Paulo')
+        out = pd.DataFrame({
+            'Open': (col('open') * factor)[ok], 'High': (col('high') * factor)[ok],
+            'Low': (col('low') * factor)[ok], 'Close': (close * factor)[ok], 'Volume': col('volume')[ok],
+        }, index=pd.DatetimeIndex(idx.tz_localize(None).normalize(), name='Date'))
+        return out[~out.index.duplicated(keep='last')].sort_index()
+
+    @staticmethod
+    def _info(item):
+        stats = item.get('defaultKeyStatistics') or {}
+        fin = item.get('financialData') or {}
+        # Só chaves que os motores leem, no formato do .info do Yahoo. O DY sai
+        # dos proventos (calculate_dy_manual), sem depender da unidade do campo de yield.
+        info = {'longName': item.get('longName'), 'currency': item.get('currency'),
+                'trailingPE': item.get('priceEarnings'), 'priceToBook': stats.get('priceToBook'),
+                'returnOnEquity': fin.get('returnOnEquity')}
+        return {k: v for k, v in info.items() if v is not None}
+
+    @staticmethod
+    def _dividends(item):
+        cash = (item.get('dividendsData') or {}).get('cashDividends') or []
+        dates = [c.get('lastDatePrior') or c.get('paymentDate') for c in cash]
+        pairs = [(d, c.get('rate')) for d, c in zip(dates, cash) if d and c.get('rate') is not None]
+        if not pairs: return pd.Series(dtype=float, name='Dividends', index=pd.DatetimeIndex([], tz='America/Sao_Paulo'))
+        idx = pd.to_datetime([d for d, _ in pairs], utc=True).tz_convert('America/Sao_Paulo')
+        return pd.Series([r for _, r in pairs], index=idx, name='Dividends').sort_index()
+
+
+class RoutedProvider:
+    # Cada ticker vai para o primeiro provedor que o atende; o último é o padrão
+    name = 'roteado'
+
+    def __init__(self, providers):
+        self.providers = providers
+        self.batch_size = providers[-1].batch_size
+
+    def supports(self, ticker):
+        return True
+
+    def route(self, ticker):
+        return next((p for p in self.providers if p.supports(ticker)), self.providers[-1])
+
+    def history(self, tickers, start=None):
+        groups = {}
+        for ticker in tickers: groups.setdefault(self.route(ticker), []).append(ticker)
+        frames = {}
+        for provider, group in groups.items(): frames.update(provider.history(group, start))
+        return frames
+
+    def info(self, ticker):
+        return self.route(ticker).info(ticker)
+
+    def dividends(self, ticker):
+        return self.route(ticker).dividends(ticker)
+
+
+def make_provider(name='yahoo', token=None, **kwargs):
+    # 'yahoo': tudo pelo Yahoo. 'brapi': B3 pelo brapi, o resto pelo Yahoo.
+    if name == 'brapi': return RoutedProvider([BrapiProvider(token, **kwargs), YahooProvider()])
+    if name == 'yahoo': return YahooProvider()
+    raise ValueError(f"provedor desconhecido: {name}")
@@ -0,0 +1,151 @@
+import threading
+import numpy as np
+import pandas as pd
+
+
+# --- RISCO DO UNIVERSO: RETORNOS, VOLATILIDADE E CORRELAÇÃO ---
+# Matriz de retornos alinhada por data para o universo inteiro (Fiagros,
+# ações, BDRs e commodities juntos), volatilidade móvel, correlação e
+# agrupamento hierárquico. scipy só é importado no agrupamento.
+WINDOW = 252        # Pregões da janela de correlação (1 ano)
+VOL_WINDOW = 21     # Pregões da volatilidade de curto prazo (1 mês)
+ANNUAL = 252        # Pregões por ano, para anualizar
+MAX_HEATMAP = 120   # Acima disso o mapa de calor mostra grupos, não ativos
+GROUPS = 8          # Grupos de ativos parecidos na tabela de risco
+
+
+def returns_matrix(frames, window=WINDOW):
+    # Log-retornos diários das últimas 'window' datas da união dos calendários
+    # (B3, NYSE, CME). Em dia sem pregão do ativo o preço anterior se repete
+    # (retorno 0). Só entra quem tem cotação desde o começo da janela.
+    # O preenchimento vem antes do recorte: feriado de um mercado na primeira
+    # data da janela repete o preço anterior em vez de tirar o mercado todo.
+    closes = {t: df['Close'].iloc[-(window + 2):] for t, df in frames.items() if df is not None and len(df) > 1}
+    if not closes: return pd.DataFrame()
+    prices = pd.DataFrame(closes, dtype=np.float64).sort_index().ffill().iloc[-(window + 1):]
+    prices = prices.loc[:, prices.iloc[0].notna().to_numpy()]
+    return np.log(prices).diff().iloc[1:]
+
+
+def rolling_volatility(returns, window=VOL_WINDOW):
+    # Desvio padrão móvel anualizado (%) por soma acumulada de r e r²: O(T) por
+    # coluna, todas as colunas juntas
+    x = returns.to_numpy(dtype=np.float64)
+    if len(x) < window: return pd.DataFrame(index=returns.index, columns=returns.columns, dtype=float)
+    c1 = np.vstack([np.zeros(x.shape[1]), np.cumsum(x, axis=0)])
+    c2 = np.vstack([np.zeros(x.shape[1]), np.cumsum(x * x, axis=0)])
+    s1, s2 = c1[window:] - c1[:-window], c2[window:] - c2[:-window]
+    var = np.clip((s2 - s1 * s1 / window) / (window - 1), 0, None)
+    out = np.full(x.shape, np.nan)
+    out[window - 1:] = np.sqrt(var * ANNUAL) * 100
+    return pd.DataFrame(out, index=returns.index, columns=returns.columns)
+
+
+class RiskModel:
+    # Estatísticas suficientes da janela de retornos: soma por ativo e produto
+    # cruzado X'X. Barra nova, revisada (pregão em andamento) ou que saiu da
+    # janela entra e sai por atualização de posto baixo, O(k·n²) para k linhas
+    # alteradas, em vez de refazer O(n²·T). Reconstrói do zero quando o
+    # universo muda ou a cada 'rebuild_every' linhas, limitando o erro acumulado.
+    def __init__(self, window=WINDOW, rebuild_every=None):
+        self.window = window
+        self.rebuild_every = rebuild_every or 5 * window
+        self.returns = None
+        self.lock = threading.Lock()  # Quem atualiza e lê em threads diferentes
+        self.rebuilds = 0
+        self.updates = 0
+        self._sum = None
+        self._cross = None
+        self._drift = 0  # Linhas aplicadas desde a última reconstrução
+
+    def fit(self, returns):
+        x = returns.to_numpy(dtype=np.float64)
+        self._sum, self._cross = x.sum(axis=0), x.T @ x
+        self.returns, self._drift = returns, 0
+        self.rebuilds += 1
+        return self
+
+    def update(self, returns):
+        old = self.returns
+        if old is None or not old.columns.equals(returns.columns): return self.fit(returns)
+        a, b = old.to_numpy(dtype=np.float64), returns.to_numpy(dtype=np.float64)
+        common = old.index.intersection(returns.index)
+        oi, ni = old.index.get_indexer(common), returns.index.get_indexer(common)
+        changed = (a[oi] != b[ni]).any(axis=1)
+        minus = np.concatenate([np.flatnonzero(~old.index.isin(common)), oi[changed]])
+        plus = np.concatenate([np.flatnonzero(~returns.index.isin(common)), ni[changed]])
+        k = len(minus) + len(plus)
+        if k >= len(returns) or self._drift + k > self.rebuild_every: return self.fit(returns)
+        if k:
+            self._sum += b[plus].sum(axis=0) - a[minus].sum(axis=0)
+            self._cross += b[plus].T @ b[plus] - a[minus].T @ a[minus]
+            self._drift += k
+            self.updates += 1
+        self.returns = returns
+        return self
+
+    def covariance(self):
+        n = len(self.returns)
+        mean = self._sum / n
+        return (self._cross - n * np.outer(mean, mean)) / (n - 1)
+
+    def volatility(self):
+        # Volatilidade anualizada (%) da janela inteira
+        var = np.clip(np.diag(self.covariance()), 0, None)
+        return pd.Series(np.sqrt(var * ANNUAL) * 100, index=self.returns.columns)
+
+    def correlation(self):
+        cov = self.covariance()
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = np.clip(np.nan_to_num(cov / np.outer(std, std)), -1, 1)
+        np.fill_diagonal(corr, 1.0)
+        columns = self.returns.columns
+        return pd.DataFrame(corr.astype(np.float32), index=columns, columns=columns)
+
+
+def cluster(corr):
+    # Agrupamento hierárquico (ligação média) na distância sqrt((1 - ρ) / 2).
+    # Devolve a matriz de ligação e a ordem das folhas (vizinhos lado a lado).
+    from scipy.cluster.hierarchy import leaves_list, linkage
+    from scipy.spatial.distance import squareform
+    dist = np.sqrt(np.clip((1 - corr.to_numpy(dtype=np.float64)) / 2, 0, None))
+    np.fill_diagonal(dist, 0.0)
+    z = linkage(squareform(dist, checks=False), method='average')
+    return z, leaves_list(z)
+
+
+def groups(z, order, k):
+    # Corta a árvore em até k grupos, numerados (1..k) na ordem das folhas:
+    # grupos vizinhos no mapa de calor são parecidos
+    from scipy.cluster.hierarchy import fcluster
+    labels = fcluster(z, k, criterion='maxclust')
+    _, first = np.unique(labels[order], return_index=True)
+    rank = np.empty(labels.max() + 1, dtype=int)
+    rank[labels[order][np.sort(first)]] = np.arange(1, len(first) + 1)
+    return rank[labels]
+
+
+def heatmap_view(corr, z, order, max_size=MAX_HEATMAP):
+    # Até 'max_size' ativos: a matriz inteira na ordem do agrupamento. Acima,
+    # a correlação média entre grupos (cortes da árvore), calculada com uma
+    # matriz de pertinência: B = M'CM, sem laço por par de ativos.
+    # Devolve a matriz do mapa e {rótulo: tickers}.
+    if len(order) <= max_size:
+        view = corr.iloc[order, order]
+        return view, {t: [t] for t in view.columns}
+    group = groups(z, order, max_size)
+    k = group.max()
+    member = np.zeros((len(group), k))
+    member[np.arange(len(group)), group - 1] = 1.0
+    counts = member.sum(axis=0)
+    sums = member.T @ corr.to_numpy(dtype=np.float64) @ member
+    pairs = np.outer(counts, counts)
+    # Na diagonal, só os pares distintos (sem a correlação de cada ativo consigo)
+    np.fill_diagonal(pairs, counts * (counts - 1))
+    np.fill_diagonal(sums, np.diag(sums) - counts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        blocks = np.where(pairs > 0, sums / pairs, 1.0)
+    names = [f"G{g} ({int(c)})" for g, c in zip(range(1, k + 1), counts)]
+    members = {name: list(corr.columns[group == g]) for g, name in zip(range(1, k + 1), names)}
+    return pd.DataFrame(blocks.astype(np.float32), index=names, columns=names), members
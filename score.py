@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+_start = time.perf_counter()
+import pandas as pd
+from agro_analytics import AgroDatabase, TechnicalEngine, FundamentalEngine, UNIVERSE_PATH
+from fetcher import Fetcher
+from pipeline import build_results
+IMPORT_SECONDS = time.perf_counter() - _start
+
+
+# --- SCORE DO UNIVERSO EM LOTE (SEM STREAMLIT) ---
+# Uso: python score.py [--category Commodities] [--format csv|json] [--output arquivo]
+#                       [--tech-only] [--processes N] [--universe universo.csv]
+# Baixa (ou lê do disco) as cotações, calcula os scores e grava a tabela
+# completa. Sem --output, escreve na saída padrão. Universos grandes são
+# pontuados em paralelo, um processo por núcleo.
+def score(db, tech, fund, categories, tech_only=False):
+    frames = []
+    for category in categories:
+        if tech_only:
+            scores = tech.score_universe(db.get_tickers(category))
+            df = scores.rename(columns={'Score': 'Score Téc.', 'Close': 'Preço'}).rename_axis('Ativo').reset_index()
+            df['Var%'] = (df['Preço'] / df.pop('PrevClose') - 1) * 100
+        else:
+            df = build_results(db, tech, fund, category)
+        df.insert(0, 'Categoria', category)
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score do universo do AgroMonitor")
+    parser.add_argument('--category', action='append', help="categoria (repetível); padrão: todas")
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--output', help="arquivo de saída (padrão: stdout)")
+    parser.add_argument('--tech-only', action='store_true', help="só o score técnico, sem fundamentos")
+    parser.add_argument('--universe', default=UNIVERSE_PATH, help="arquivo do universo (CSV ou JSON)")
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help="processos para o score técnico")
+    args = parser.parse_args()
+
+    fetcher = Fetcher()
+    db, tech = AgroDatabase(args.universe), TechnicalEngine(fetcher=fetcher, processes=args.processes)
+    fund = FundamentalEngine(fetcher=fetcher, tech_engine=tech)
+    categories = args.category or list(db.assets)
+    unknown = [c for c in categories if c not in db.assets]
+    if unknown: parser.error(f"categoria desconhecida: {', '.join(unknown)}")
+
+    start = time.perf_counter()
+    tech.prefetch([t for c in categories for t in db.get_tickers(c)])
+    df = score(db, tech, fund, categories, args.tech_only)
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if args.format == 'csv': df.to_csv(out, index=False)
+        else: df.to_json(out, orient='records', force_ascii=False, indent=2)
+    finally:
+        if args.output: out.close()
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {len(df)} ativos em {time.perf_counter() - start:.1f}s "
+          f"(import {IMPORT_SECONDS * 1000:.0f} ms)", file=sys.stderr)
+    errors = fetcher.describe_errors()
+    if errors: print(f"  falhas: {', '.join(errors)}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import os
+import pickle
+import time
+
+
+# --- SNAPSHOT DO DASHBOARD EM DISCO ---
+# O worker grava, o app só lê. A gravação vai para um arquivo temporário e
+# troca de lugar com os.replace: o app nunca lê um snapshot pela metade.
+# SNAPSHOT_SCHEMA muda quando o formato muda; snapshots antigos são ignorados.
+SNAPSHOT_SCHEMA = 3
+
+
+def write_snapshot(payload, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    version = time.time_ns() // 1_000_000  # Versão = instante da geração, em ms
+    payload = dict(payload, schema=SNAPSHOT_SCHEMA, version=version, generated_at=time.time())
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return version
+
+
+def read_snapshot(path):
+    try:
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if not isinstance(payload, dict) or payload.get('schema') != SNAPSHOT_SCHEMA: return None
+    return payload
+
+
+def snapshot_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
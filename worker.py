@@ -0,0 +1,56 @@
+import argparse
+import time
+from datetime import datetime
+from agro_analytics import AgroDatabase, TechnicalEngine, FundamentalEngine, SNAPSHOT_PATH
+from fetcher import Fetcher
+from alerts import AlertEngine
+from pipeline import build_alert_frame, build_snapshot
+from risk import RiskModel
+from snapshot import write_snapshot
+
+
+# --- WORKER DE PRÉ-CÁLCULO ---
+# Roda o pipeline completo em intervalo fixo e grava o snapshot que o app lê.
+# Uso: python worker.py [--interval 3600] [--once] [--output caminho]
+def run_cycle(db, tech, fund, path, risk_model=None, alerts=None):
+    # Cada ciclo busca dados novos: o histórico em disco torna isso um download
+    # incremental, que também traz os proventos novos.
+    tech.refresh(db.get_tickers())
+    fund.info_cache.clear()
+    start = time.time()
+    payload = build_snapshot(db, tech, fund, risk_model)
+    # Regras avaliadas a cada ciclo; o app mostra os últimos alertas do snapshot
+    fired = alerts.evaluate(build_alert_frame(db, tech, payload['categories'])) if alerts else []
+    payload['alerts'] = alerts.recent_alerts() if alerts else []
+    version = write_snapshot(payload, path)
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] snapshot {version} gravado em {time.time() - start:.1f}s"
+          + (f", {len(fired)} alertas" if fired else ""))
+    errors = tech.fetcher.describe_errors()
+    if errors: print(f"  falhas: {', '.join(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-cálculo do AgroMonitor")
+    parser.add_argument('--interval', type=int, default=3600, help="segundos entre ciclos")
+    parser.add_argument('--once', action='store_true', help="roda um ciclo e sai")
+    parser.add_argument('--output', default=SNAPSHOT_PATH, help="arquivo do snapshot")
+    args = parser.parse_args()
+
+    fetcher = Fetcher()
+    db, tech = AgroDatabase(), TechnicalEngine(fetcher=fetcher)
+    fund = FundamentalEngine(fetcher=fetcher, tech_engine=tech)
+    risk_model = RiskModel()  # Somas da janela de correlação mantidas entre ciclos
+    alerts = AlertEngine.from_file()  # Estado das regras também: o disparo é por borda
+    while True:
+        try:
+            run_cycle(db, tech, fund, args.output, risk_model, alerts)
+        except Exception as exc:
+            # Um ciclo ruim não derruba o worker; o app segue com o snapshot anterior
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] ciclo falhou: {type(exc).__name__}: {exc}")
+            if args.once: raise SystemExit(1)
+        if args.once: break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()